@@ -1,6 +1,7 @@
 // Chat functionality
 let chatMessages = [];
 let isTyping = false;
+let isStreaming = false;
 let isChatOpen = false;
 
 // Initialize chat
@@ -30,7 +31,7 @@ function sendMessage() {
     const messageInput = document.getElementById('messageInput');
     const message = messageInput.value.trim();
     
-    if (message === '' || isTyping) return;
+    if (message === '' || isTyping || isStreaming) return;
     
     // Hide welcome section after first user message
     if (chatMessages.length <= 1) {
@@ -120,8 +121,65 @@ function hideTypingIndicator() {
     isTyping = false;
 }
 
+// Add an empty bot message that is filled in while the answer streams
+function startStreamingMessage() {
+    hideTypingIndicator();
+    addMessage('', 'bot');
+    
+    const chatContainer = document.getElementById('chatMessages');
+    const contentDiv = chatContainer.lastElementChild.querySelector('.message-content');
+    const message = chatMessages[chatMessages.length - 1];
+    
+    return {
+        append(text) {
+            message.content += text;
+            contentDiv.innerHTML = convertUrlsToLinks(message.content);
+            chatContainer.scrollTop = chatContainer.scrollHeight;
+        }
+    };
+}
+
 // Handle bot response
 async function handleBotResponse(userMessage) {
+    let streamingMessage = null;
+    isStreaming = true;
+    try {
+        // Render the answer token by token as the model writes it
+        const result = await streamFromRAGAPI(userMessage, (text) => {
+            if (!streamingMessage) {
+                streamingMessage = startStreamingMessage();
+            }
+            streamingMessage.append(text);
+        });
+        
+        if (streamingMessage) {
+            if (!result.success) {
+                streamingMessage.append('\n\n' + result.response);
+            }
+            return;
+        }
+        if (!result.success) {
+            // The API answered with an error before any text: use the local responses
+            hideTypingIndicator();
+            addMessage(generateBotResponse(userMessage), 'bot');
+            return;
+        }
+    } catch (error) {
+        console.error('Error streaming RAG response:', error);
+        if (streamingMessage) {
+            streamingMessage.append('\n\nThe connection was interrupted. Please try again.');
+            return;
+        }
+    } finally {
+        isStreaming = false;
+    }
+    
+    // Streaming is unavailable (e.g. an older API): ask /chat for the whole answer
+    await handleNonStreamingResponse(userMessage);
+}
+
+// Handle bot response from the non-streaming /chat endpoint
+async function handleNonStreamingResponse(userMessage) {
     try {
         // Try to get response from RAG API first
         const ragResponse = await sendToRAGAPI(userMessage);
@@ -310,6 +368,82 @@ async function sendToRAGAPI(message) {
     }
 }
 
+// Streaming RAG API: /chat/stream sends the answer as Server-Sent Events.
+// onToken is called with each piece of text; resolves with the final done/error event data.
+async function streamFromRAGAPI(message, onToken) {
+    console.log('🚀 Streaming from GPT-4o API:', message);
+    const startTime = performance.now();
+    let firstTokenAt = null;
+    
+    const response = await fetch('http://localhost:5000/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            query: message,
+            membership_type: 'All Access',
+            context: {
+                source: 'chatbot_ui',
+                timestamp: new Date().toISOString()
+            }
+        })
+    });
+    
+    if (!response.ok || !response.body) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const event = parseServerSentEvent(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+            
+            if (event.type === 'token') {
+                if (firstTokenAt === null) {
+                    firstTokenAt = performance.now();
+                    console.log(`⏱️ First token after ${Math.round(firstTokenAt - startTime)} ms`);
+                }
+                onToken(event.data.text);
+            } else if (event.type === 'done') {
+                console.log('✅ Stream complete:', event.data.metadata);
+                return event.data;
+            } else if (event.type === 'error') {
+                console.error('❌ Stream error:', event.data.error);
+                return event.data;
+            }
+        }
+    }
+    
+    throw new Error('Stream ended before the answer was complete');
+}
+
+// Parse one Server-Sent Event block into its type and JSON data
+function parseServerSentEvent(block) {
+    let type = 'message';
+    const dataLines = [];
+    
+    block.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            type = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+        }
+    });
+    
+    return { type, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : {} };
+}
+
 // Legacy API Integration (keeping for reference)
 async function sendToAPI(message) {
     // This is the old category suggestion API
@@ -385,6 +519,7 @@ window.chatbot = {
     toggleChatbot,
     refreshChat,
     sendToRAGAPI,
+    streamFromRAGAPI,
     sendToAPI,
     convertUrlsToLinks
 };
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Embedding Backend Benchmark
+Checks ONNX / int8 embeddings for parity with the torch embeddings and compares
+load time, per-query encode latency and peak RSS.
+
+Each backend runs in its own subprocess so import cost and RSS are measured in isolation.
+
+Usage:
+    python benchmark_embeddings.py [--model sentence-transformers/all-MiniLM-L6-v2] [--repeats 50]
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKENDS = ["torch", "onnx", "onnx_int8"]
+
+# Minimum cosine similarity to the torch embedding of the same text
+PARITY_THRESHOLDS = {"onnx": 0.999, "onnx_int8": 0.97}
+
+SAMPLE_TEXTS = [
+    "what is po",
+    "discount on all access plus",
+    "what is the price of private office",
+    "how do I book a meeting room on demand",
+    "virtual office address for gst registration",
+    "wifi not working in my private office",
+    "how do I pay my invoice",
+    "wework centers in bangalore",
+]
+
+
+def run_worker(backend: str, model_name: str, cache_dir: str, repeats: int, output_path: str):
+    """Load one backend, encode the sample texts and write timings plus vectors."""
+    start = time.perf_counter()
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(model_name=model_name, model_kwargs={'device': 'cpu'},
+                                           encode_kwargs={'normalize_embeddings': True})
+    else:
+        from onnx_embeddings import load_onnx_embeddings
+        embeddings = load_onnx_embeddings(model_name, cache_dir, quantized=backend == "onnx_int8")
+    load_seconds = time.perf_counter() - start
+
+    embeddings.embed_query(SAMPLE_TEXTS[0])  # warm-up
+    timings = []
+    for _ in range(repeats):
+        for text in SAMPLE_TEXTS:
+            start = time.perf_counter()
+            embeddings.embed_query(text)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    np.save(output_path, np.asarray(embeddings.embed_documents(SAMPLE_TEXTS), dtype=np.float32))
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "p50_ms": statistics.median(timings),
+        "p95_ms": sorted(timings)[int(len(timings) * 0.95) - 1],
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--cache-dir", default="./cache")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.model, args.cache_dir, args.repeats, args.output)
+        return
+
+    results, vectors = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in BACKENDS:
+            output = os.path.join(tmp, f"{backend}.npy")
+            completed = subprocess.run(
+                [sys.executable, __file__, "--worker", backend, "--model", args.model,
+                 "--cache-dir", args.cache_dir, "--repeats", str(args.repeats), "--output", output],
+                capture_output=True, text=True, check=True,
+            )
+            results[backend] = json.loads(completed.stdout.strip().splitlines()[-1])
+            vectors[backend] = np.load(output)
+
+    # Vectors are normalised, so the row-wise dot product is the cosine similarity
+    parity = {backend: float(np.min(np.sum(vectors[backend] * vectors["torch"], axis=1))) for backend in BACKENDS}
+
+    print(f"\n{'backend':<12}{'load s':>9}{'p50 ms':>9}{'p95 ms':>9}{'RSS MB':>9}{'min cos':>10}")
+    for backend in BACKENDS:
+        result = results[backend]
+        print(f"{backend:<12}{result['load_seconds']:>9.2f}{result['p50_ms']:>9.2f}"
+              f"{result['p95_ms']:>9.2f}{result['max_rss_mb']:>9.0f}{parity[backend]:>10.4f}")
+
+    failed = [backend for backend, threshold in PARITY_THRESHOLDS.items() if parity[backend] < threshold]
+    if failed:
+        print(f"\n❌ Parity check failed vs torch: {failed} (thresholds: {PARITY_THRESHOLDS})")
+        sys.exit(1)
+    print(f"\n✅ Parity check passed vs torch (thresholds: {PARITY_THRESHOLDS})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Prompt Cache Benchmark
+Measures the input-token and latency savings of sending the WeWork instructions as a
+byte-stable system prefix (wework_prompt.WEWORK_SYSTEM_PROMPT) ahead of the per-request
+chunks and question.
+
+Two layouts are sent to GPT-4o with the same questions:
+  split   - static system prompt first, then the chunks and question (what the API sends)
+  dynamic - chunks and question first, then the same instructions, as the old template
+            did; the prefix changes on every request, so the provider cache cannot hit
+
+For each layout it reports prompt tokens, tokens served from OpenAI's prompt cache,
+the equivalent billed input tokens (cached tokens cost half) and time to first token.
+Completions are capped at --max-tokens so the numbers reflect prompt processing.
+Needs OPENAI_API_KEY.
+
+Usage:
+    python benchmark_prompt_cache.py [--requests 10] [--max-tokens 16]
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from wework_prompt import WEWORK_SYSTEM_PROMPT, get_wework_messages, get_wework_user_message, prompt_prefix_fingerprint
+
+SAMPLE_QUESTIONS = [
+    "What is a private office?",
+    "How much does All Access cost?",
+    "Can I cancel a conference room booking?",
+    "What are the day pass timings?",
+    "Which cities is WeWork in?",
+    "Is there a discount on All Access Plus?",
+]
+
+SAMPLE_CHUNKS = """Chunk 1:
+A private office is a fully furnished, lockable office for teams of any size, with access to shared amenities.
+
+Chunk 2:
+Day pass members have access from 9am to 8pm Monday to Friday and 10am to 4pm on Saturdays."""
+
+# OpenAI bills cached prompt tokens at half the input price
+CACHED_TOKEN_PRICE = 0.5
+
+
+def build_messages(layout: str, question: str) -> list:
+    if layout == "split":
+        return get_wework_messages(question, SAMPLE_CHUNKS)
+    return [{"role": "user", "content": get_wework_user_message(question, SAMPLE_CHUNKS) + "\n\n" + WEWORK_SYSTEM_PROMPT}]
+
+
+def send(client, messages: list, max_tokens: int) -> dict:
+    """Stream one completion. Returns prompt_tokens, cached_tokens and ttft (seconds)."""
+    start = time.perf_counter()
+    ttft = None
+    usage = None
+    stream = client.chat.completions.create(
+        model="gpt-4o",
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=0.15,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    for chunk in stream:
+        if ttft is None and chunk.choices and chunk.choices[0].delta.content:
+            ttft = time.perf_counter() - start
+        if chunk.usage:
+            usage = chunk.usage
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+        "ttft": ttft if ttft is not None else time.perf_counter() - start,
+    }
+
+
+def report(layout: str, results: list) -> float:
+    prompt_tokens = sum(result["prompt_tokens"] for result in results)
+    cached_tokens = sum(result["cached_tokens"] for result in results)
+    billed = prompt_tokens - cached_tokens * (1 - CACHED_TOKEN_PRICE)
+    ttfts = [result["ttft"] for result in results]
+    print(f"{layout}:")
+    print(f"  prompt tokens / request  {prompt_tokens / len(results):8.0f}")
+    print(f"  cached tokens / request  {cached_tokens / len(results):8.0f}  ({cached_tokens / prompt_tokens:.0%})")
+    print(f"  billed input / request   {billed / len(results):8.0f}")
+    print(f"  ttft p50                 {statistics.median(ttfts) * 1000:8.0f} ms")
+    return billed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10, help="measured requests per layout")
+    parser.add_argument("--max-tokens", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"Static prefix: {len(WEWORK_SYSTEM_PROMPT.encode('utf-8'))} bytes, sha256 {prompt_prefix_fingerprint()[:16]}")
+
+    from openai import OpenAI
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    questions = [SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)] for i in range(args.requests)]
+
+    billed = {}
+    for layout in ("dynamic", "split"):
+        # One unmeasured request so the split layout starts with its prefix cached, as in steady state
+        send(client, build_messages(layout, questions[0] + " (warm-up)"), args.max_tokens)
+        results = [send(client, build_messages(layout, f"{question} (request {i})"), args.max_tokens)
+                   for i, question in enumerate(questions)]
+        billed[layout] = report(layout, results)
+
+    print(f"Billed input tokens saved by the split layout: {1 - billed['split'] / billed['dynamic']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
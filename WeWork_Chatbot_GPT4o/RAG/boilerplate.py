@@ -0,0 +1,74 @@
+"""
+Boilerplate Filter
+Learns which text lines repeat across many scraped pages (navigation, footers, city
+menus) and strips them before chunking, so the index is not filled with near-identical
+chunks that push real content out of the top-k.
+"""
+
+import json
+import os
+from collections import Counter
+
+
+def normalise_line(line: str) -> str:
+    return " ".join(line.split())
+
+
+class BoilerplateFilter:
+    """Line-level boilerplate detector fitted on a whole corpus of page texts.
+
+    A line counts as boilerplate when it appears on at least ``min_fraction`` of the
+    pages (and on at least ``min_pages`` of them), which catches site-wide menus while
+    leaving text that a handful of related pages share.
+
+    A fitted filter is saved with the index version it was applied to and reused by
+    incremental builds: refitting on every build would let one changed page move
+    lines in or out of the set and so change the chunks of every other page.
+    """
+
+    def __init__(self, min_fraction: float = 0.3, min_pages: int = 5):
+        self.min_fraction = min_fraction
+        self.min_pages = min_pages
+        self.boilerplate = set()
+        self.pages = 0
+
+    def __len__(self):
+        return len(self.boilerplate)
+
+    def fit(self, texts) -> "BoilerplateFilter":
+        page_counts = Counter()
+        self.pages = 0
+        for text in texts:
+            self.pages += 1
+            page_counts.update({normalise_line(line) for line in text.splitlines()} - {""})
+
+        threshold = max(self.min_pages, self.min_fraction * self.pages)
+        self.boilerplate = {line for line, count in page_counts.items() if count >= threshold}
+        return self
+
+    def save(self, path: str):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({"min_fraction": self.min_fraction, "min_pages": self.min_pages, "pages": self.pages,
+                       "boilerplate": sorted(self.boilerplate)}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BoilerplateFilter":
+        """The filter saved at path, or None if there is none."""
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            data = json.load(f)
+        fitted = cls(min_fraction=data["min_fraction"], min_pages=data["min_pages"])
+        fitted.pages = data["pages"]
+        fitted.boilerplate = set(data["boilerplate"])
+        return fitted
+
+    def strip(self, text: str) -> str:
+        kept = []
+        for line in text.splitlines():
+            key = normalise_line(line)
+            if key and key not in self.boilerplate:
+                kept.append(line)
+        return "\n".join(kept)
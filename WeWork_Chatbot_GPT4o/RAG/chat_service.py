@@ -0,0 +1,289 @@
+"""
+Chat Service
+The transport-independent part of the WeWork GPT-4o API, shared by the Flask app
+(flask_api.py) and the ASGI app (asgi_api.py): RAG start-up state, the semantic answer
+cache, retrieval for a query, the GPT-4o messages and prompt-cache accounting, background
+rebuilds, and the bodies of /health, /status, /retrieve, /rebuild and the chat events.
+The apps only route requests and do their sync or async I/O.
+"""
+
+import os
+import logging
+import threading
+import time
+
+API_STARTED_AT = time.time()
+
+# Import RAG components (heavy dependencies load on first use, see warm_up_rag_system)
+from optimized_rag import (initialize_rag_system, warm_up_rag_system, rebuild_rag_system, multi_step_retrieve,
+                           describe_query, embedding_model, get_active_index, get_index_status, is_rebuild_in_progress,
+                           startup_timings)
+startup_timings["import_rag"] = round(time.time() - API_STARTED_AT, 3)
+from wework_prompt import get_wework_messages
+from answer_cache import SemanticAnswerCache
+from streaming import FirstTokenStats, sse_event
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "gpt-4o"
+# Answers starting with this are failed GPT-4o calls and are never cached
+LLM_ERROR_PREFIX = "Error with GPT-4o"
+
+ERROR_RESPONSE = ("I apologize, but I encountered an error while processing your question. "
+                  "Please try rephrasing your question or contact support.")
+TIMEOUT_RESPONSE = "I'm sorry, this is taking longer than expected. Please try again in a moment."
+NO_QUERY_ERROR = {"error": "No query provided", "success": False}
+
+# Global state
+rag_initialized = False
+rag_init_error = None
+rag_lock = threading.Lock()
+
+def active_version():
+    index = get_active_index()
+    return index["version"] if index else None
+
+
+# Semantic answer cache (served for near-duplicate questions about the same entities
+# on the active index version)
+answer_cache = SemanticAnswerCache(
+    max_entries=int(os.getenv("WEWORK_ANSWER_CACHE_SIZE", "512")),
+    ttl_seconds=float(os.getenv("WEWORK_ANSWER_CACHE_TTL", "3600")),
+    similarity_threshold=float(os.getenv("WEWORK_ANSWER_CACHE_THRESHOLD", "0.95")),
+    current_version=active_version
+)
+
+# Time to first token of /chat/stream answers
+first_token_stats = FirstTokenStats()
+
+# Prompt tokens sent to GPT-4o and how many of them hit the provider's prompt cache
+prompt_usage = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+prompt_usage_lock = threading.Lock()
+
+
+def build_gpt4o_messages(question: str, context_chunks: list) -> list:
+    """Chat messages for GPT-4o with the WeWork prompt"""
+
+    chunks_retrieved = "\n\n".join([f"Chunk {i+1}:\n{chunk.page_content}"
+                                   for i, chunk in enumerate(context_chunks)])
+
+    # Static system prompt first so OpenAI's prompt cache can serve it
+    return get_wework_messages(question, chunks_retrieved)
+
+
+def record_prompt_usage(usage):
+    """Count the prompt tokens of one completion and how many OpenAI served from its prompt cache."""
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) or 0
+    with prompt_usage_lock:
+        prompt_usage["requests"] += 1
+        prompt_usage["prompt_tokens"] += usage.prompt_tokens
+        prompt_usage["cached_tokens"] += cached_tokens
+
+
+def prompt_usage_stats() -> dict:
+    with prompt_usage_lock:
+        stats = dict(prompt_usage)
+    stats["cached_ratio"] = round(stats["cached_tokens"] / stats["prompt_tokens"], 4) if stats["prompt_tokens"] else 0.0
+    return stats
+
+
+def init_rag():
+    """Initialize the RAG system (in a background thread, or in the pre-fork master)."""
+    global rag_initialized, rag_init_error
+    with rag_lock:
+        if not rag_initialized:
+            logger.info("Initializing RAG system for GPT-4o...")
+            try:
+                initialize_rag_system()
+                warm_up_rag_system()
+                rag_initialized = True
+                rag_init_error = None
+                startup_timings["ready"] = round(time.time() - API_STARTED_AT, 3)
+                logger.info("✅ RAG system initialized successfully for GPT-4o")
+            except Exception as e:
+                logger.error(f"❌ Failed to initialize RAG system: {e}", exc_info=True)
+                rag_initialized = False
+                rag_init_error = str(e)
+
+
+def unavailable(llm_ready: bool = True) -> dict:
+    """Error body (served with a 503) while this process cannot answer queries, else None."""
+    if not rag_initialized:
+        return {"error": "RAG system not initialized yet. Please wait.", "success": False}
+    if not llm_ready:
+        return {"error": "OpenAI client not initialized", "success": False}
+    return None
+
+
+def query_from(data: dict) -> str:
+    data = data or {}
+    return data.get('query') or data.get('message')
+
+
+def retrieve_for_query(query: str) -> tuple:
+    """CPU-bound part of /chat: (answer cache key, cached answer, chunks).
+
+    On a cache hit the chunks are None; otherwise the answer is None and the chunks
+    come from the index version active now. Pass the key to remember_answer.
+    """
+    # Pinned to the index version active now
+    index = get_active_index()
+    # Keyed on the expanded query ("aa" and "aa plus" embed almost alike) and scoped to the
+    # named cities, buildings and products ("... in Pune" vs "... in Mumbai")
+    expanded_query, entities = describe_query(query, index=index)
+    cache_key = (embedding_model.embed_query(expanded_query), index["version"], tuple(entities))
+    cached = answer_cache.get(cache_key[0], scope=cache_key[2])
+    if cached is not None:
+        return cache_key, cached, None
+    return cache_key, None, multi_step_retrieve(index["retriever"], query, k=8, index=index)
+
+
+def remember_answer(cache_key, response_text: str):
+    """Cache a generated answer under the key from retrieve_for_query, unless the LLM call failed.
+
+    The cache drops it if the index was rebuilt since retrieval.
+    """
+    if response_text and not response_text.startswith(LLM_ERROR_PREFIX):
+        embedding, version, entities = cache_key
+        answer_cache.put(embedding, response_text, version=version, scope=entities)
+
+
+def mark_first_chat():
+    # Cold start as seen by clients: API module load to the first answered /chat
+    startup_timings.setdefault("first_chat", round(time.time() - API_STARTED_AT, 3))
+
+
+def chat_metadata(query: str, response_text: str, membership_type: str, cache_hit: bool,
+                  processing_time: float, **fields) -> dict:
+    """The ``metadata`` of a /chat response and of the ``done`` stream event."""
+    return {
+        "processing_time": round(processing_time, 2),
+        **fields,
+        "query_length": len(query),
+        "response_length": len(response_text),
+        "membership_type": membership_type,
+        "model": MODEL_NAME,
+        "cache_hit": cache_hit
+    }
+
+
+def token_event(text: str) -> str:
+    return sse_event("token", {"text": text})
+
+
+def done_event(query: str, response_text: str, membership_type: str, cache_hit: bool,
+               processing_time: float, ttft: float) -> str:
+    return sse_event("done", {
+        "success": True,
+        "metadata": chat_metadata(query, response_text, membership_type, cache_hit, processing_time,
+                                  ttft=round(ttft, 3) if ttft is not None else None)
+    })
+
+
+def error_event(body: dict) -> str:
+    """Closes a stream that failed; ``body`` is error_body() or timeout_body()."""
+    return sse_event("error", body)
+
+
+def error_body(e: Exception) -> dict:
+    return {"error": f"Internal server error: {e}", "response": ERROR_RESPONSE, "success": False}
+
+
+def timeout_body(deadline: float) -> dict:
+    return {"error": f"No answer within {deadline:.0f} seconds", "response": TIMEOUT_RESPONSE, "success": False}
+
+
+def retrieve_body(query: str) -> dict:
+    """Body of /retrieve: the chunks retrieved for a query, without calling the LLM."""
+    start_time = time.time()
+    index = get_active_index()
+    chunks = multi_step_retrieve(index["retriever"], query, k=8, index=index)
+    return {
+        "chunks": [{"content": chunk.page_content, "source": chunk.metadata.get("source")} for chunk in chunks],
+        "success": True,
+        "metadata": {
+            "processing_time": round(time.time() - start_time, 4),
+            "index_version": index["version"]
+        }
+    }
+
+
+def health_body(service: str, llm_ready: bool) -> tuple:
+    """Readiness check: (body, 200) only once this process can answer queries, else (body, 503)."""
+    ready = rag_initialized and llm_ready and get_active_index() is not None
+    if ready:
+        status = "ready"
+    elif rag_init_error:
+        status = "failed"
+    else:
+        status = "starting"
+    return {
+        "status": status,
+        "service": service,
+        "rag_initialized": rag_initialized,
+        "openai_initialized": llm_ready,
+        "active_version": get_index_status()["active_version"],
+        "error": rag_init_error,
+        "pid": os.getpid()
+    }, 200 if ready else 503
+
+
+def status_body(service: str, llm_ready: bool, **fields) -> dict:
+    """Detailed status; ``fields`` are the serving-path specific entries."""
+    return {
+        "service": service,
+        "rag_initialized": rag_initialized,
+        "openai_initialized": llm_ready,
+        "ready_for_queries": rag_initialized and llm_ready,
+        **fields,
+        "answer_cache": answer_cache.stats(),
+        "streaming": first_token_stats.stats(),
+        "prompt_cache": prompt_usage_stats(),
+        "query_embedding_cache": embedding_model.stats(),
+        "index": get_index_status(),
+        "startup_seconds": dict(startup_timings)
+    }
+
+
+def run_rebuild(full: bool, refresh_web: bool, reextract_web: bool):
+    """Build the next index version in the background; the active one keeps serving."""
+    try:
+        stats = rebuild_rag_system(full=full, refresh_web=refresh_web, reextract_web=reextract_web)
+        # Cached answers were produced from the previous index version
+        answer_cache.clear()
+        logger.info(f"✅ Knowledge base rebuilt successfully via API: {stats}")
+    except Exception as e:
+        logger.error(f"Failed to rebuild index: {e}", exc_info=True)
+
+
+def start_rebuild(args) -> tuple:
+    """Handle /rebuild (see flask_api.rebuild_knowledge_base): returns (body, status code)."""
+    error = unavailable()
+    if error:
+        return error, 503
+
+    if is_rebuild_in_progress():
+        return {
+            "error": "A rebuild is already in progress",
+            "success": False,
+            "index": get_index_status()
+        }, 409
+
+    full = args.get('full', 'false').lower() in ('1', 'true', 'yes')
+    refresh_web = args.get('refresh_web', 'false').lower() in ('1', 'true', 'yes')
+    reextract_web = args.get('reextract_web', 'false').lower() in ('1', 'true', 'yes')
+    logger.info(f"Rebuild request received ({'full' if full else 'incremental'}, refresh_web={refresh_web}, "
+                f"reextract_web={reextract_web}). Building next index version...")
+    threading.Thread(target=run_rebuild, args=(full, refresh_web, reextract_web), daemon=True).start()
+
+    return {
+        "message": "Rebuild started; the current index keeps serving until the new one is ready",
+        "success": True,
+        "mode": "full" if full else "incremental",
+        "refresh_web": refresh_web,
+        "reextract_web": reextract_web,
+        "active_version": get_index_status()["active_version"]
+    }, 202
@@ -0,0 +1,121 @@
+"""
+Chunk Embedding Cache
+Persistent SQLite cache of document embeddings keyed by (model, sha256 of chunk text).
+
+Index builds embed through it, so rebuilding after a small edit, a full /rebuild or
+switching back to a model that was used before only encodes chunks it has not seen.
+Vectors are stored as raw float32 blobs.
+"""
+
+import hashlib
+import sqlite3
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# SQLite limits the number of bound parameters per statement
+LOOKUP_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_hash BLOB NOT NULL,
+    dim INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (model, text_hash)
+) WITHOUT ROWID
+"""
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+
+class ChunkEmbeddingCache(Embeddings):
+    """Read-through, write-back cache in front of an embedding model's document path.
+
+    ``model`` is the cache namespace and must change whenever the vectors would
+    (different model, or a backend that produces different numbers). Queries pass
+    straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings, path: str, model: str):
+        self.embeddings = embeddings
+        self.path = path
+        self.model = model
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+        self.encoded = 0
+        self.encode_seconds = 0.0
+
+    def _lookup(self, hashes: list) -> dict:
+        found = {}
+        for offset in range(0, len(hashes), LOOKUP_BATCH):
+            batch = hashes[offset:offset + LOOKUP_BATCH]
+            rows = self._conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? "
+                f"AND text_hash IN ({','.join('?' * len(batch))})",
+                [self.model, *batch],
+            )
+            found.update((bytes(key), np.frombuffer(vector, dtype=np.float32).tolist()) for key, vector in rows)
+        return found
+
+    def embed_documents(self, texts: list) -> list:
+        hashes = [text_hash(text) for text in texts]
+        vectors = self._lookup(list(dict.fromkeys(hashes)))
+        hits = sum(1 for key in hashes if key in vectors)
+        self.hits += hits
+        self.misses += len(hashes) - hits
+
+        # Encode each distinct uncached text once
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            start = time.perf_counter()
+            computed = np.asarray(self.embeddings.embed_documents(list(missing.values())), dtype=np.float32)
+            self.encode_seconds += time.perf_counter() - start
+            self.encoded += len(missing)
+
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(self.model, key, len(vector), vector.tobytes(), now) for key, vector in zip(missing, computed)],
+            )
+            self._conn.commit()
+            vectors.update((key, vector.tolist()) for key, vector in zip(missing, computed))
+
+        return [vectors[key] for key in hashes]
+
+    def embed_query(self, text: str) -> list:
+        return self.embeddings.embed_query(text)
+
+    def entries(self, model: str = None) -> int:
+        if model is None:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)).fetchone()[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model,
+            "entries": self.entries(self.model),
+            "hits": self.hits,
+            "misses": self.misses,
+            "encoded": self.encoded,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "encode_seconds": round(self.encode_seconds, 2),
+        }
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,134 @@
+"""
+Query Embedding Cache
+Memoises query embeddings so repeated or rewritten queries skip the encoder, and
+defers loading the encoder itself until it is first needed.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+
+def normalise_query(text: str) -> str:
+    """Cache key of a query: lowercased, whitespace collapsed, so trivially different queries share an entry.
+
+    Only the key is normalised; the encoder sees the query as written (the model is cased).
+    """
+    return " ".join(text.lower().split())
+
+
+class LazyEmbeddings(Embeddings):
+    """Embedding model built by ``factory`` on first use (or an explicit load()).
+
+    Importing torch and reading model weights takes seconds, so a process that never
+    embeds anything, or that wants to time the load as its own startup phase, does
+    not pay for it at import.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.load_seconds = None
+        self._embeddings = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._embeddings is not None
+
+    def load(self) -> Embeddings:
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    start = time.perf_counter()
+                    embeddings = self.factory()
+                    self.load_seconds = time.perf_counter() - start
+                    self._embeddings = embeddings
+        return self._embeddings
+
+    def embed_documents(self, texts: list) -> list:
+        return self.load().embed_documents(texts)
+
+    def embed_query(self, text: str) -> list:
+        return self.load().embed_query(text)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Thread-safe LRU cache in front of an embedding model's query path.
+
+    Document embeddings (used when building the index) pass straight through;
+    only query embeddings are cached, keyed by normalise_query() of the query text.
+    The first spelling of a key to miss is the one encoded.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_entries: int = 2048):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.encode_seconds_spent = 0.0
+
+    def embed_documents(self, texts: list) -> list:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: list) -> list:
+        """Embed several queries, encoding all cache misses in one batch."""
+        keys = [normalise_query(text) for text in texts]
+        vectors = {}
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    vectors[key] = self._cache[key]
+                    self.hits += 1
+
+        missing = {}  # key -> text to encode
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            # Wall time of the encode call: torch spreads it over its own threads, which
+            # neither process_time (every thread of the process) nor thread_time measures
+            encode_start = time.perf_counter()
+            if len(missing) == 1:
+                computed = [self.embeddings.embed_query(*missing.values())]
+            else:
+                computed = self.embeddings.embed_documents(list(missing.values()))
+            encode_spent = time.perf_counter() - encode_start
+
+            with self._lock:
+                self.misses += len(missing)
+                self.encode_seconds_spent += encode_spent
+                for key, vector in zip(missing, computed):
+                    self._cache[key] = vector
+                    vectors[key] = vector
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+
+        return [vectors[key] for key in keys]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            seconds_per_embedding = self.encode_seconds_spent / self.misses if self.misses else 0.0
+            return {
+                "entries": len(self._cache),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "avg_encode_ms_per_embedding": round(seconds_per_embedding * 1000, 2),
+                "encode_seconds_saved": round(self.hits * seconds_per_embedding, 3),
+            }
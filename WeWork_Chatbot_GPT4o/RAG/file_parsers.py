@@ -0,0 +1,129 @@
+"""
+File Parsers
+Turns knowledge base files (PDF, DOCX, TXT, JSON) into Documents.
+
+Kept apart from optimized_rag so process-pool workers can import the parsers
+without loading the embedding model and vector store.
+"""
+
+import json
+import os
+import signal
+import threading
+import time
+
+from langchain_core.documents import Document
+
+# Bump when parsing output changes so cached documents are re-parsed
+PARSER_VERSION = 2
+
+
+def is_json_knowledge_file(file_name: str) -> bool:
+    return file_name.endswith('_enhanced_json.txt') or file_name.endswith('.json')
+
+
+def join_tags(tags) -> str:
+    """Tags as one string (Chroma metadata values must be scalars); a single tag may be given as a string."""
+    if not tags:
+        return ""
+    if isinstance(tags, str):
+        return tags
+    return ", ".join(str(tag) for tag in tags)
+
+
+def load_qa_documents(file_path: str) -> list:
+    """Load a JSON list of question/answer objects as one Document per pair.
+
+    Returns an empty list when the file is not a Q&A list, so the caller can
+    fall back to the plain text loader.
+    """
+    try:
+        with open(file_path, 'r') as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return []
+    if not isinstance(data, list) or not all(isinstance(item, dict) and 'question' in item and 'answer' in item
+                                             for item in data):
+        return []
+
+    return [
+        Document(
+            page_content=f"Question: {item['question']}\nAnswer: {item['answer']}",
+            metadata={
+                "source": file_path,
+                "qa_pair": True,
+                "user_type": item.get('user_type', ''),
+                "tags": join_tags(item.get('tags')),
+            }
+        )
+        for item in data
+    ]
+
+
+def load_local_file(file_path: str, structured_json: bool = True) -> list:
+    """Parse one knowledge base file into Documents."""
+    file = os.path.basename(file_path)
+    qa_docs = load_qa_documents(file_path) if structured_json and is_json_knowledge_file(file) else []
+    if qa_docs:
+        # One document per question/answer pair, kept whole by the splitter
+        return qa_docs
+    # Parser libraries are imported on first use, so workers only load what their files need
+    if file.endswith('.pdf'):
+        # Use PyPDF2 for PDF files
+        import PyPDF2
+        with open(file_path, 'rb') as pdf_file:
+            pdf_reader = PyPDF2.PdfReader(pdf_file)
+            text = "".join(page.extract_text() or "" for page in pdf_reader.pages)
+            return [Document(page_content=text, metadata={"source": file_path})]
+    if file.endswith('.docx') or file.endswith('.doc'):
+        # Use docx2txt for Word documents
+        import docx2txt
+        text = docx2txt.process(file_path)
+        return [Document(page_content=text, metadata={"source": file_path})]
+    if file.endswith('.txt'):
+        # Use TextLoader for text files
+        from langchain_community.document_loaders import TextLoader
+        return TextLoader(file_path).load()
+    if file.endswith('.json'):
+        # Handle JSON files manually
+        with open(file_path, 'r') as json_file:
+            data = json.load(json_file)
+            text = json.dumps(data, indent=2)
+            return [Document(page_content=text, metadata={"source": file_path})]
+    return []
+
+
+class ParseTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise ParseTimeout()
+
+
+def parse_file_timed(args) -> tuple:
+    """Process-pool entry point: (file_path, structured_json, timeout) -> (docs, seconds, error).
+
+    The timeout is enforced inside the worker with SIGALRM where the platform has it,
+    so a stuck file fails on its own without taking the pool down. Signal handlers can
+    only be installed from the main thread, so a serial parse in the /rebuild or startup
+    thread runs without a timeout.
+    """
+    file_path, structured_json, timeout = args
+    use_alarm = bool(timeout) and hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+    previous_handler = None
+    start = time.perf_counter()
+    try:
+        if use_alarm:
+            previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        return load_local_file(file_path, structured_json), time.perf_counter() - start, None
+    except ParseTimeout:
+        return [], time.perf_counter() - start, f"timed out after {timeout}s"
+    except Exception as e:
+        return [], time.perf_counter() - start, f"{type(e).__name__}: {e}"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            if previous_handler is not None:
+                signal.signal(signal.SIGALRM, previous_handler)
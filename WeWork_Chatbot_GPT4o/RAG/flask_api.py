@@ -8,13 +8,15 @@ import os
 import logging
 import threading
 import time
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from openai import OpenAI
 
-# Import RAG components
-from optimized_rag import initialize_rag_system, multi_step_retrieve
-from wework_prompt import get_wework_prompt
+# Shared with asgi_api.py; imports the RAG components and starts the cold-start clock
+import chat_service
+from chat_service import (answer_cache, first_token_stats, build_gpt4o_messages, record_prompt_usage,
+                          retrieve_for_query, remember_answer, startup_timings)
+from optimized_rag import follow_current_version, prepare_prefork_parent, prepare_prefork_worker
+from streaming import SSE_HEADERS
 
 # Configure logging
 logging.basicConfig(
@@ -31,16 +33,21 @@ CORS(app)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 openai_client = None
 
-# Global state
-rag_initialized = False
-rag_lock = threading.Lock()
-retriever = None
+# Set by gunicorn.conf.py: the master initialises before forking instead of a background thread
+PREFORK = os.getenv("WEWORK_PREFORK") == "1"
+# How often a pre-fork worker checks whether another worker published a new index version
+INDEX_FOLLOW_INTERVAL = float(os.getenv("WEWORK_INDEX_FOLLOW_INTERVAL", "5"))
+index_follow_lock = threading.Lock()
+index_checked_at = 0.0
 
 def initialize_openai():
     """Initialize OpenAI client"""
     global openai_client
+    start_time = time.time()
     try:
+        from openai import OpenAI
         openai_client = OpenAI(api_key=OPENAI_API_KEY)
+        startup_timings["llm_client"] = round(time.time() - start_time, 3)
         logger.info("✅ OpenAI client initialized")
         return True
     except Exception as e:
@@ -49,168 +56,231 @@ def initialize_openai():
 
 def query_with_gpt4o(question: str, context_chunks: list) -> str:
     """Query GPT-4o with the WeWork prompt"""
-    
-    chunks_retrieved = "\n\n".join([f"Chunk {i+1}:\n{chunk.page_content}" 
-                                   for i, chunk in enumerate(context_chunks)])
-    
-    prompt = get_wework_prompt(question, chunks_retrieved)
-    
     try:
         response = openai_client.chat.completions.create(
             model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a helpful WeWork customer service assistant."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=build_gpt4o_messages(question, context_chunks),
             max_tokens=8000,
             temperature=0.15
         )
+        record_prompt_usage(response.usage)
         
         return response.choices[0].message.content.strip()
     except Exception as e:
         return f"Error with GPT-4o: {str(e)}"
 
-def init_rag():
-    """Initialize RAG system in background thread."""
-    global rag_initialized, retriever
-    with rag_lock:
-        if not rag_initialized:
-            logger.info("Initializing RAG system for GPT-4o...")
-            try:
-                initialize_rag_system()
-                
-                # Get the retriever from the module
-                from optimized_rag import retriever as rag_retriever
-                retriever = rag_retriever
-                
-                rag_initialized = True
-                logger.info("✅ RAG system initialized successfully for GPT-4o")
-            except Exception as e:
-                logger.error(f"❌ Failed to initialize RAG system: {e}", exc_info=True)
-                rag_initialized = False
-
-# Initialize OpenAI and RAG system
-if initialize_openai():
-    threading.Thread(target=init_rag, daemon=True).start()
+def stream_with_gpt4o(question: str, context_chunks: list):
+    """query_with_gpt4o, yielding the answer text as GPT-4o produces it."""
+    stream = openai_client.chat.completions.create(
+        model="gpt-4o",
+        messages=build_gpt4o_messages(question, context_chunks),
+        max_tokens=8000,
+        temperature=0.15,
+        stream=True,
+        # The last chunk then carries the token usage
+        stream_options={"include_usage": True}
+    )
+    for chunk in stream:
+        if chunk.usage:
+            record_prompt_usage(chunk.usage)
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def create_prefork_app():
+    """Gunicorn entry point (see gunicorn.conf.py).
+
+    With preload_app the master loads the index and embedding model and warms up once,
+    synchronously, before any worker is forked; workers share them copy-on-write.
+    """
+    if not initialize_openai():
+        raise RuntimeError("OpenAI client could not be initialized")
+    chat_service.init_rag()
+    if not chat_service.rag_initialized:
+        raise RuntimeError(f"RAG system failed to initialize: {chat_service.rag_init_error}")
+    prepare_prefork_parent()
+    return app
+
+def init_prefork_worker():
+    """Per-worker setup after the fork (gunicorn post_fork hook)."""
+    prepare_prefork_worker()
+    # HTTP connection pools are not shared across processes
+    initialize_openai()
+
+# Initialize OpenAI and RAG system; not in helper processes spawned for index builds,
+# which import this module as __mp_main__ when the API runs as a script
+if not PREFORK and __name__ != "__mp_main__" and initialize_openai():
+    threading.Thread(target=chat_service.init_rag, daemon=True).start()
+
+def follow_index_in_background():
+    """Let a pre-fork worker pick up an index version that a rebuild in another worker published."""
+    global index_checked_at
+    if not index_follow_lock.acquire(blocking=False):
+        return
+    index_checked_at = time.time()
+
+    def follow():
+        try:
+            if follow_current_version():
+                answer_cache.clear()
+        except Exception as e:
+            logger.error(f"Failed to switch to the published index version: {e}", exc_info=True)
+        finally:
+            index_follow_lock.release()
+
+    threading.Thread(target=follow, daemon=True).start()
+
+@app.before_request
+def check_published_index():
+    if PREFORK and chat_service.rag_initialized and time.time() - index_checked_at >= INDEX_FOLLOW_INTERVAL:
+        follow_index_in_background()
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint."""
-    return jsonify({
-        "status": "healthy",
-        "service": "WeWork GPT-4o API",
-        "rag_initialized": rag_initialized,
-        "openai_initialized": openai_client is not None
-    })
+    """Readiness check: 200 only once this process can answer queries, 503 otherwise."""
+    body, status_code = chat_service.health_body("WeWork GPT-4o API", openai_client is not None)
+    return jsonify(body), status_code
 
 @app.route('/status', methods=['GET'])
 def get_status():
     """Detailed status endpoint."""
-    return jsonify({
-        "service": "WeWork GPT-4o RAG API",
-        "rag_initialized": rag_initialized,
-        "openai_initialized": openai_client is not None,
-        "ready_for_queries": rag_initialized and openai_client is not None
-    })
+    return jsonify(chat_service.status_body("WeWork GPT-4o RAG API", openai_client is not None))
 
 @app.route('/chat', methods=['POST'])
 def chat():
     """Process chatbot queries using GPT-4o."""
-    if not rag_initialized:
-        return jsonify({
-            "error": "RAG system not initialized yet. Please wait.",
-            "success": False
-        }), 503
-        
-    if not openai_client:
-        return jsonify({
-            "error": "OpenAI client not initialized",
-            "success": False
-        }), 503
+    error = chat_service.unavailable(openai_client is not None)
+    if error:
+        return jsonify(error), 503
         
     data = request.json
-    query = data.get('query') or data.get('message')
+    query = chat_service.query_from(data)
+    membership_type = data.get('membership_type', 'General')
     
     if not query:
-        return jsonify({
-            "error": "No query provided",
-            "success": False
-        }), 400
+        return jsonify(chat_service.NO_QUERY_ERROR), 400
         
     try:
         start_time = time.time()
-        logger.info(f"Processing query with GPT-4o: '{query}' (membership: {data.get('membership_type', 'General')})")
+        logger.info(f"Processing query with GPT-4o: '{query}' (membership: {membership_type})")
         
-        # Get relevant chunks using RAG retrieval
-        context_chunks = multi_step_retrieve(retriever, query, k=8)
+        # Serve near-duplicate questions from the semantic answer cache, else retrieve and ask GPT-4o
+        cache_key, response_text, context_chunks = retrieve_for_query(query)
+        cache_hit = response_text is not None
         
-        # Query GPT-4o
-        response_text = query_with_gpt4o(query, context_chunks)
+        if not cache_hit:
+            response_text = query_with_gpt4o(query, context_chunks)
+            remember_answer(cache_key, response_text)
         
         processing_time = time.time() - start_time
         logger.info(f"GPT-4o query processed in {processing_time:.2f} seconds")
+        chat_service.mark_first_chat()
         
         return jsonify({
             "response": response_text,
             "success": True,
-            "metadata": {
-                "processing_time": round(processing_time, 2),
-                "query_length": len(query),
-                "response_length": len(response_text),
-                "membership_type": data.get('membership_type', 'General'),
-                "model": "gpt-4o"
-            }
+            "metadata": chat_service.chat_metadata(query, response_text, membership_type, cache_hit, processing_time)
         })
         
     except Exception as e:
         logger.error(f"Error processing chat query with GPT-4o: {e}", exc_info=True)
-        return jsonify({
-            "error": f"Internal server error: {e}",
-            "response": "I apologize, but I encountered an error while processing your question. Please try rephrasing your question or contact support.",
-            "success": False
-        }), 500
+        return jsonify(chat_service.error_body(e)), 500
 
-@app.route('/rebuild', methods=['POST'])
-def rebuild_knowledge_base():
-    """Rebuild the knowledge base."""
-    global rag_initialized
-    logger.info("Rebuild request received. Reinitializing RAG system...")
-    rag_initialized = False
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Like /chat, but streams the answer as Server-Sent Events while GPT-4o generates it.
     
-    try:
-        # Clear cache
-        import shutil
-        cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
-        if os.path.exists(cache_dir):
-            shutil.rmtree(cache_dir)
-            logger.info(f"Cleared cache directory: {cache_dir}")
-        
-        # Reinitialize
-        init_rag()
-        logger.info("✅ Knowledge base rebuilt successfully via API.")
+    Emits ``token`` events ({"text": ...}) and then one ``done`` event with the /chat
+    metadata plus ``ttft``, the seconds from request to first token, or one ``error``
+    event. Answers from the answer cache arrive as a single token event.
+    """
+    error = chat_service.unavailable(openai_client is not None)
+    if error:
+        return jsonify(error), 503
         
-        return jsonify({
-            "message": "Knowledge base rebuilt successfully",
-            "success": True
-        })
-        
-    except Exception as e:
-        logger.error(f"Failed to rebuild index: {e}", exc_info=True)
-        return jsonify({
-            "error": f"Failed to rebuild index: {e}",
-            "success": False
-        }), 500
+    data = request.json
+    query = chat_service.query_from(data)
+    membership_type = data.get('membership_type', 'General')
+    
+    if not query:
+        return jsonify(chat_service.NO_QUERY_ERROR), 400
+    
+    def generate():
+        start_time = time.time()
+        logger.info(f"Streaming query with GPT-4o: '{query}' (membership: {membership_type})")
+        try:
+            cache_key, response_text, context_chunks = retrieve_for_query(query)
+            cache_hit = response_text is not None
+            
+            if cache_hit:
+                ttft = time.time() - start_time
+                first_token_stats.record_cached()
+                yield chat_service.token_event(response_text)
+            else:
+                ttft = None
+                parts = []
+                for text in stream_with_gpt4o(query, context_chunks):
+                    if ttft is None:
+                        ttft = time.time() - start_time
+                        first_token_stats.record(ttft)
+                    parts.append(text)
+                    yield chat_service.token_event(text)
+                response_text = "".join(parts).strip()
+                remember_answer(cache_key, response_text)
+            
+            processing_time = time.time() - start_time
+            logger.info(f"GPT-4o query streamed in {processing_time:.2f} seconds "
+                        f"(first token after {ttft or 0:.2f}s)")
+            chat_service.mark_first_chat()
+            
+            yield chat_service.done_event(query, response_text, membership_type, cache_hit, processing_time, ttft)
+            
+        except Exception as e:
+            logger.error(f"Error streaming chat query with GPT-4o: {e}", exc_info=True)
+            first_token_stats.record_error()
+            yield chat_service.error_event(chat_service.error_body(e))
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+@app.route('/retrieve', methods=['POST'])
+def retrieve():
+    """Return the chunks retrieved for a query without calling the LLM (debugging and load tests)."""
+    error = chat_service.unavailable()
+    if error:
+        return jsonify(error), 503
+    
+    query = chat_service.query_from(request.json)
+    if not query:
+        return jsonify(chat_service.NO_QUERY_ERROR), 400
+    
+    return jsonify(chat_service.retrieve_body(query))
+
+@app.route('/rebuild', methods=['POST'])
+def rebuild_knowledge_base():
+    """Rebuild the knowledge base without downtime.
+
+    The next index version is built in the background while queries keep using the
+    active one, then swapped in atomically. Incremental by default (only changed files
+    are re-parsed and re-embedded); pass ?full=true to rebuild everything.
+    ?refresh_web=true re-checks every URL with conditional requests (ETag /
+    Last-Modified) so only pages that changed are re-chunked and re-embedded;
+    ?reextract_web=true re-derives web page text from the stored raw HTML.
+    Poll /status for build progress.
+    """
+    body, status_code = chat_service.start_rebuild(request.args)
+    return jsonify(body), status_code
 
 def print_startup_message():
     """Print formatted startup message."""
     print("=" * 60)
     print("🚀 WeWork GPT-4o RAG API Server")
     print("=" * 60)
-    print(f"✅ RAG system initialized: {rag_initialized}")
+    print(f"✅ RAG system initialized: {chat_service.rag_initialized}")
     print(f"✅ OpenAI client ready: {openai_client is not None}")
     print("📡 API Endpoints:")
     print("  • POST /chat        - Process chatbot queries with GPT-4o")
-    print("  • GET  /health      - Health check")
+    print("  • POST /chat/stream - Same, streamed as Server-Sent Events")
+    print("  • POST /retrieve    - Retrieved chunks only, no LLM call")
+    print("  • GET  /health      - Readiness check")
     print("  • GET  /status      - System status")
     print("  • POST /rebuild     - Rebuild knowledge base")
     print("🌐 Starting server on http://localhost:5000")
@@ -0,0 +1,37 @@
+"""
+Gunicorn configuration for pre-fork serving
+
+The master imports flask_api, loads the index and embedding model and runs the warm-up
+once (preload_app), then forks the workers. Model weights, the BM25 index and the
+abbreviation index are shared copy-on-write; with the NumPy vector backends the vectors
+are memory-mapped and shared through the page cache as well.
+
+Usage:
+    gunicorn -c gunicorn.conf.py
+"""
+
+import multiprocessing
+import os
+
+# Read by flask_api at import: initialise in the master instead of a background thread
+os.environ.setdefault("WEWORK_PREFORK", "1")
+# One intra-op thread per worker: the workers already use every core, and OpenMP
+# thread pools started in the master do not survive the fork
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+wsgi_app = "flask_api:create_prefork_app()"
+preload_app = True
+
+bind = os.getenv("WEWORK_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEWORK_WORKERS", "0")) or multiprocessing.cpu_count()
+# Threads let a worker keep serving while other requests wait on the LLM API
+worker_class = "gthread"
+threads = int(os.getenv("WEWORK_WORKER_THREADS", "4"))
+timeout = int(os.getenv("WEWORK_WORKER_TIMEOUT", "120"))
+
+
+def post_fork(server, worker):
+    from flask_api import init_prefork_worker
+    init_prefork_worker()
@@ -0,0 +1,134 @@
+"""
+HTML Store
+Content-addressed, gzip-compressed store for raw scraped HTML with a URL -> digest index.
+
+Keeping the raw pages means text extraction can be re-run locally (in parallel across
+cores) whenever it improves, instead of fetching and rendering every URL again.
+Identical pages are stored once.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+INDEX_FILE = 'index.json'
+OBJECTS_DIR = 'objects'
+
+
+class HtmlStore:
+    """objects/<aa>/<sha256>.html.gz plus index.json mapping each URL to its current digest.
+
+    Static fetches are stored as the raw response bytes along with the charset their
+    Content-Type named (None: decode by the page's own declaration, see
+    web_scraper.decode_html); browser-rendered pages are stored as UTF-8.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.objects_dir = os.path.join(root, OBJECTS_DIR)
+        self.index_path = os.path.join(root, INDEX_FILE)
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+
+    def __len__(self):
+        return len(self.index)
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest + '.html.gz')
+
+    def put(self, url: str, html, charset: str = None) -> str:
+        """Store html (str, or raw bytes in ``charset``) if not already present and point url at it.
+
+        Returns the digest.
+        """
+        if isinstance(html, str):
+            data, charset = html.encode('utf-8'), 'utf-8'
+        else:
+            data = html
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        self.index[url] = {"digest": digest, "charset": charset, "stored_at": time.time()}
+        return digest
+
+    def digest_for(self, url: str) -> str:
+        entry = self.index.get(url)
+        return entry["digest"] if entry else None
+
+    def charset_for(self, url: str) -> str:
+        # Entries written before raw bytes were stored hold UTF-8
+        return self.index.get(url, {}).get("charset", "utf-8")
+
+    def get(self, digest: str) -> bytes:
+        with gzip.open(self.object_path(digest), 'rb') as f:
+            return f.read()
+
+    def retain(self, urls) -> int:
+        """Drop index entries for URLs not in urls. Returns how many were dropped."""
+        keep = set(urls)
+        dropped = [url for url in self.index if url not in keep]
+        for url in dropped:
+            del self.index[url]
+        return len(dropped)
+
+    def prune(self) -> int:
+        """Delete objects no URL points at any more. Returns how many were deleted."""
+        referenced = {entry["digest"] for entry in self.index.values()}
+        removed = 0
+        for bucket in os.listdir(self.objects_dir):
+            for name in os.listdir(os.path.join(self.objects_dir, bucket)):
+                if name.endswith('.html.gz') and name[:-len('.html.gz')] not in referenced:
+                    os.remove(os.path.join(self.objects_dir, bucket, name))
+                    removed += 1
+        return removed
+
+    def save(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+
+def _extract_object(args):
+    """(text, None) for one stored page, or (None, error) so one bad page does not fail the batch."""
+    path, charset, extract = args
+    try:
+        with gzip.open(path, 'rb') as f:
+            return extract(f.read(), charset), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def extract_texts(store: HtmlStore, urls: list, extract, workers: int = None) -> dict:
+    """Run extract(raw html bytes, charset) over the stored HTML of each URL on a process pool.
+
+    ``extract`` must be a module-level function so it can be sent to the workers; each
+    worker reads and decompresses its own pages. URLs without stored HTML, or whose
+    extraction fails, are left out, so callers keep their previous text.
+    """
+    paths = [(url, store.object_path(store.digest_for(url))) for url in urls if store.digest_for(url)]
+    if not paths:
+        return {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(paths) // ((workers or os.cpu_count() or 1) * 4))
+        results = executor.map(_extract_object, [(path, store.charset_for(url), extract) for url, path in paths],
+                               chunksize=chunksize)
+        texts = {}
+        for (url, _), (text, error) in zip(paths, results):
+            if error:
+                print(f"Error extracting text for {url}: {error}")
+            else:
+                texts[url] = text
+        return texts
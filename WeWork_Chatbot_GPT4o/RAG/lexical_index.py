@@ -0,0 +1,94 @@
+"""
+Lexical Index
+In-memory BM25 inverted index over the indexed chunks, reciprocal rank fusion for
+combining lexical and vector rankings, and phrase lookup for names in a query.
+"""
+
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "at", "be", "can", "do", "does", "for", "how", "i", "in", "is",
+    "it", "me", "my", "of", "on", "or", "the", "to", "what", "where", "which", "with", "you",
+}
+
+
+def tokenize(text: str) -> list:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def find_phrases(text: str, table: dict) -> list:
+    """Values of ``table`` (keyed by tokenize() tuples) whose phrase occurs in text.
+
+    Scans left to right and takes the longest phrase at each position, so "aa plus"
+    matches the entry for "aa plus" rather than the one for "aa".
+    """
+    tokens = tokenize(text)
+    longest = max(map(len, table), default=0)
+    found = []
+    i = 0
+    while i < len(tokens):
+        for n in range(min(longest, len(tokens) - i), 0, -1):
+            value = table.get(tuple(tokens[i:i + n]))
+            if value is not None:
+                found.append(value)
+                i += n
+                break
+        else:
+            i += 1
+    return found
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of chunks, built once at ingest time."""
+
+    def __init__(self, documents: list, k1: float = 1.5, b: float = 0.75):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+
+        self.postings = defaultdict(list)  # term -> [(doc index, term frequency)]
+        self.doc_lengths = []
+        for idx, doc in enumerate(documents):
+            counts = Counter(tokenize(doc.page_content))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, freq in counts.items():
+                self.postings[term].append((idx, freq))
+
+        total = len(documents)
+        self.avg_length = (sum(self.doc_lengths) / total) if total else 0.0
+        self.idf = {
+            term: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def __len__(self):
+        return len(self.documents)
+
+    def search(self, query: str, k: int = 8) -> list:
+        """Return up to k (document, score) pairs, best first."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for idx, freq in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[idx] / self.avg_length)
+                scores[idx] += idf * freq * (self.k1 + 1) / (freq + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.documents[idx], score) for idx, score in best]
+
+
+def reciprocal_rank_fusion(ranked_lists: list, k: int = 60) -> list:
+    """Fuse several ranked chunk lists into one, scoring each chunk by sum(1 / (k + rank))."""
+    scores = defaultdict(float)
+    chunks = {}
+    for ranking in ranked_lists:
+        for rank, chunk in enumerate(ranking, start=1):
+            key = chunk.page_content
+            chunks.setdefault(key, chunk)
+            scores[key] += 1.0 / (k + rank)
+    return [chunks[key] for key in sorted(scores, key=scores.get, reverse=True)]
@@ -0,0 +1,190 @@
+"""
+NumPy Vector Store
+Exact in-process vector search over a memory-mapped embedding matrix.
+
+For a knowledge base of a few thousand chunks a brute-force dot product over a
+contiguous matrix is as fast as an ANN index and avoids the Chroma client entirely.
+"""
+
+import json
+import os
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+MATRIX_FILE = 'embeddings.npy'
+SCALES_FILE = 'scales.npy'
+DOCUMENTS_FILE = 'documents.json'
+
+# Rows of an int8 matrix converted to float32 at a time when scoring queries
+SCORE_BLOCK_ROWS = 4096
+
+
+def quantize_int8(vectors: np.ndarray):
+    """Symmetric per-row int8 quantisation. Returns (int8 matrix, float32 row scales)."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+class NumpyVectorStore(VectorStore):
+    """Vector store backed by a float32 (or int8-quantised) NumPy matrix.
+
+    Persisted as ``embeddings.npy`` plus ``documents.json`` and reopened with
+    ``mmap_mode='r'``, so the matrix is paged in lazily and shared between processes.
+    """
+
+    def __init__(self, embedding, persist_directory: str = None, quantize: bool = False):
+        self._embedding = embedding
+        self.persist_directory = persist_directory
+        self.quantize = quantize
+
+        self._matrix = None
+        self._scales = None
+        self._texts = []
+        self._metadatas = []
+        self._ids = []
+
+        if persist_directory and os.path.exists(os.path.join(persist_directory, DOCUMENTS_FILE)):
+            self._load()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _load(self):
+        with open(os.path.join(self.persist_directory, DOCUMENTS_FILE), 'r') as f:
+            data = json.load(f)
+        self.quantize = data["quantized"]
+        self._texts = data["texts"]
+        self._metadatas = data["metadatas"]
+        self._ids = data["ids"]
+        if self._ids:
+            self._matrix = np.load(os.path.join(self.persist_directory, MATRIX_FILE), mmap_mode='r')
+            if self.quantize:
+                self._scales = np.load(os.path.join(self.persist_directory, SCALES_FILE), mmap_mode='r')
+
+    def persist(self):
+        """Write the store to disk. Files are replaced atomically so open memory maps stay valid."""
+        if not self.persist_directory:
+            return
+        os.makedirs(self.persist_directory, exist_ok=True)
+
+        def replace(name, write):
+            path = os.path.join(self.persist_directory, name)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+
+        if self._matrix is not None:
+            replace(MATRIX_FILE, lambda f: np.save(f, np.ascontiguousarray(self._matrix)))
+            if self.quantize:
+                replace(SCALES_FILE, lambda f: np.save(f, np.ascontiguousarray(self._scales)))
+        documents = {
+            "quantized": self.quantize,
+            "texts": self._texts,
+            "metadatas": self._metadatas,
+            "ids": self._ids,
+        }
+        replace(DOCUMENTS_FILE, lambda f: f.write(json.dumps(documents).encode('utf-8')))
+
+    def add_embeddings(self, texts: list, vectors, metadatas: list = None, ids: list = None) -> list:
+        """Append precomputed embeddings. Existing ids are replaced."""
+        texts = list(texts)
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [f"chunk-{len(self._ids) + i}" for i in range(len(texts))]
+        if not texts:
+            return []
+
+        existing = set(self._ids).intersection(ids)
+        if existing:
+            self.delete(list(existing))
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.quantize:
+            vectors, scales = quantize_int8(vectors)
+            self._scales = scales if self._scales is None else np.concatenate([self._scales, scales])
+        self._matrix = vectors if self._matrix is None else np.concatenate([self._matrix, vectors])
+        self._texts.extend(texts)
+        self._metadatas.extend(metadata or {} for metadata in metadatas)
+        self._ids.extend(ids)
+        return ids
+
+    def add_texts(self, texts, metadatas: list = None, ids: list = None, **kwargs) -> list:
+        texts = list(texts)
+        vectors = self._embedding.embed_documents(texts)
+        return self.add_embeddings(texts, vectors, metadatas, ids)
+
+    def delete(self, ids: list = None, **kwargs):
+        if not ids:
+            return
+        drop = set(ids)
+        keep = [i for i, chunk_id in enumerate(self._ids) if chunk_id not in drop]
+        self._matrix = self._matrix[keep] if keep else None
+        if self.quantize:
+            self._scales = self._scales[keep] if keep else None
+        self._texts = [self._texts[i] for i in keep]
+        self._metadatas = [self._metadatas[i] for i in keep]
+        self._ids = [self._ids[i] for i in keep]
+
+    def get_documents(self) -> list:
+        """Return every stored chunk as a Document, in index order."""
+        return [Document(page_content=text, metadata=metadata)
+                for text, metadata in zip(self._texts, self._metadatas)]
+
+    def _scores(self, query_vectors) -> np.ndarray:
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        if not self.quantize:
+            return queries @ self._matrix.T
+        # Convert the int8 matrix block by block so the float32 copy stays bounded
+        scores = np.empty((len(queries), len(self._matrix)), dtype=np.float32)
+        for start in range(0, len(self._matrix), SCORE_BLOCK_ROWS):
+            end = start + SCORE_BLOCK_ROWS
+            block = self._matrix[start:end].astype(np.float32)
+            scores[:, start:end] = (queries @ block.T) * self._scales[start:end]
+        return scores
+
+    def similarity_search_by_vectors_with_score(self, embeddings: list, k: int = 4) -> list:
+        """Exact top-k for several query vectors in one matrix product."""
+        if self._matrix is None or not len(embeddings):
+            return [[] for _ in embeddings]
+        scores = self._scores(embeddings)
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(scores, top):
+            ranked = candidates[np.argsort(-row[candidates])]
+            results.append([
+                (Document(page_content=self._texts[i], metadata=self._metadatas[i]), float(row[i]))
+                for i in ranked
+            ])
+        return results
+
+    def similarity_search_by_vectors(self, embeddings: list, k: int = 4) -> list:
+        return [[doc for doc, _ in hits] for hits in self.similarity_search_by_vectors_with_score(embeddings, k)]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, **kwargs) -> list:
+        return self.similarity_search_by_vectors([embedding], k)[0]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> list:
+        return self.similarity_search_by_vectors_with_score([self._embedding.embed_query(query)], k)[0]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> list:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k)
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas: list = None, ids: list = None,
+                   persist_directory: str = None, quantize: bool = False, **kwargs):
+        store = cls(embedding, persist_directory=persist_directory, quantize=quantize)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.persist()
+        return store
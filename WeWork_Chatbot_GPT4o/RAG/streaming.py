@@ -0,0 +1,85 @@
+"""
+Streaming Helpers
+Server-Sent Event framing for /chat/stream, the time-to-first-token statistics it
+reports through /status and the deadline the ASGI API applies to a stream.
+
+A stream is a sequence of ``token`` events carrying answer text as the model produces
+it, closed by one ``done`` event with the response metadata or one ``error`` event.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx and similar proxies from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Frame one event. The payload is JSON, so newlines in answer text survive the framing."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class FirstTokenStats:
+    """Rolling window of time-to-first-token samples, in seconds, for streamed answers.
+
+    Only answers generated by the LLM are sampled; answers served from the answer
+    cache arrive in one event and are counted separately. ``errors`` counts streams
+    that ended with an error event, whether or not a token was sent first.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+        self.streams = 0
+        self.cached = 0
+        self.errors = 0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.streams += 1
+            self._samples.append(seconds)
+
+    def record_cached(self):
+        with self._lock:
+            self.streams += 1
+            self.cached += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            last = self._samples[-1] if self._samples else None
+            stats = {"streams": self.streams, "cached": self.cached, "errors": self.errors, "samples": len(samples)}
+        if samples:
+            stats.update({
+                "ttft_last": round(last, 3),
+                "ttft_p50": round(samples[len(samples) // 2], 3),
+                "ttft_p95": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 3),
+            })
+        return stats
+
+
+async def until_deadline(chunks, deadline: float):
+    """Yield from an async iterator; raises asyncio.TimeoutError once time.monotonic() passes deadline."""
+    iterator = chunks.__aiter__()
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(iterator.__anext__(), deadline - time.monotonic())
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        # Closes the LLM stream when the deadline passes or the client goes away
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
@@ -0,0 +1,53 @@
+"""
+Prompt Prefix Test
+Two unrelated /chat requests, built the way the API builds them, must serialise to the
+same bytes up to the end of the system message, with nothing from the request before
+that point; otherwise OpenAI's prompt cache never hits.
+
+Run from the RAG folder: python -m pytest test_gpt4o_prompt_prefix.py
+"""
+
+import json
+
+import pytest
+
+chat_service = pytest.importorskip("chat_service", reason="needs the packages in requirements.txt")
+from langchain_core.documents import Document
+
+REQUESTS = [
+    ("What is a private office?",
+     [Document(page_content="A private office is a lockable room for teams of 1 to 100 people.")]),
+    ("Can I cancel a conference room booking in Pune?",
+     [Document(page_content="PO members can cancel bookings up to 24 hours ahead."),
+      Document(page_content="Pune: Embassy Tech Zone, Hinjewadi.")]),
+]
+
+
+def request_body(messages: list) -> bytes:
+    # The JSON the OpenAI client posts to /chat/completions (messages first, as it orders them)
+    return json.dumps({"messages": messages, "model": chat_service.MODEL_NAME, "stream": False}).encode('utf-8')
+
+
+def system_prefix(messages: list) -> bytes:
+    """Bytes of the request body up to the end of the system message."""
+    body = request_body(messages)
+    system = json.dumps(messages[0]).encode('utf-8')
+    return body[:body.index(system) + len(system)]
+
+
+def test_system_prefix_is_byte_identical_across_requests():
+    first, second = (chat_service.build_gpt4o_messages(question, chunks) for question, chunks in REQUESTS)
+    assert first[0]["role"] == "system"
+    prefix = system_prefix(first)
+    assert request_body(second)[:len(prefix)] == prefix
+    assert request_body(first) != request_body(second)
+
+
+@pytest.mark.parametrize("question, chunks", REQUESTS)
+def test_no_request_text_before_end_of_system_message(question, chunks):
+    messages = chat_service.build_gpt4o_messages(question, chunks)
+    body, prefix = request_body(messages), system_prefix(messages)
+    for text in [question] + [chunk.page_content for chunk in chunks]:
+        encoded = json.dumps(text)[1:-1].encode('utf-8')
+        assert encoded not in prefix
+        assert body.index(encoded) >= len(prefix)
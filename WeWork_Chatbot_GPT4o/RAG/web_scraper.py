@@ -0,0 +1,299 @@
+"""
+Web Scraper
+Static-first page fetching with a pooled, async Playwright fallback.
+
+Most pages render their text server-side, so a plain HTTP GET plus an lxml parse is
+tried first. Only pages that look client-rendered are sent to the browser pool, which
+renders many URLs with a small set of reused Chromium browsers instead of launching
+one browser per URL. Each page gets its own lightweight browser context, concurrency
+is capped by a semaphore and every page has a hard timeout.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Bump whenever extract_visible_text changes; stored pages are then re-extracted from raw HTML
+EXTRACTOR_VERSION = 1
+
+# Resource types that never contribute text but cost bandwidth and renderer memory
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+
+# Elements whose text is never visible page content
+NON_CONTENT_TAGS = ("script", "style", "noscript", "template", "svg", "iframe")
+
+# Pages with less visible text than this after a static fetch are assumed to be client-rendered
+MIN_STATIC_TEXT_CHARS = 400
+
+# An empty mount point for a JS framework means the real content arrives via JavaScript
+EMPTY_APP_ROOT = re.compile(r'<div[^>]+id=["\'](?:root|app|__next|__nuxt)["\'][^>]*>\s*</div>', re.IGNORECASE)
+
+# lxml refuses a str that still carries an encoding declaration (ValueError)
+XML_DECLARATION = re.compile(r'^\s*<\?xml[^>]*\?>', re.IGNORECASE)
+
+# Charset in a Content-Type header, and the one a page declares in its first bytes
+# (<meta charset>, <meta http-equiv content="...; charset=">, <?xml encoding=>)
+HEADER_CHARSET = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+DECLARED_CHARSET = re.compile(rb'<(?:meta|\?xml)[^>]+?(?:charset|encoding)\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+
+def decode_html(data: bytes, charset: str = None) -> str:
+    """Decode raw HTML with the charset from its Content-Type header, else the one the page
+    declares, else UTF-8 (not the ISO-8859-1 that HTTP and lxml assume for text/html)."""
+    if charset is None and not data.startswith(b'\xef\xbb\xbf'):
+        declared = DECLARED_CHARSET.search(data[:4096])
+        charset = declared.group(1).decode('ascii') if declared else None
+    try:
+        return data.decode(charset or 'utf-8-sig', errors='replace')
+    except LookupError:
+        return data.decode('utf-8-sig', errors='replace')
+
+
+def extract_visible_text(html, charset: str = None) -> str:
+    """Visible text of an HTML page (str, or raw bytes decoded with decode_html), one stripped text node per line."""
+    import lxml.html
+    from lxml.etree import ParserError
+
+    if isinstance(html, bytes):
+        html = decode_html(html, charset)
+    try:
+        tree = lxml.html.fromstring(XML_DECLARATION.sub('', html, count=1))
+    except ParserError:
+        return ""
+    for element in list(tree.iter(*NON_CONTENT_TAGS)):
+        element.drop_tree()
+    return "\n".join(text.strip() for text in tree.itertext() if text.strip())
+
+
+def browser_fallback_reason(html: str, text: str, min_text_chars: int = MIN_STATIC_TEXT_CHARS) -> str:
+    """Return why a statically fetched page needs a browser render, or None if it does not."""
+    if EMPTY_APP_ROOT.search(html):
+        return "empty app root"
+    if len(text) < min_text_chars:
+        return f"only {len(text)} chars of visible text"
+    return None
+
+
+def fetch_static_pages(urls: list, validators: dict = None, workers: int = 16, timeout: float = 10,
+                       min_text_chars: int = MIN_STATIC_TEXT_CHARS) -> tuple:
+    """GET every URL without a browser.
+
+    ``validators`` maps URLs to a previous {"etag", "last_modified"} so the request is
+    conditional. Returns ({url: (raw HTML bytes, text)} for pages that rendered
+    server-side, {url: stats}); pages missing from the first dict either came back 304
+    ("not_modified") or need a browser, and their stats carry the reason. Stats also
+    hold the ``charset`` of the Content-Type header, if it named one.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    validators = validators or {}
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    for scheme in ("http://", "https://"):
+        session.mount(scheme, HTTPAdapter(pool_connections=workers, pool_maxsize=workers))
+
+    def fetch(url):
+        start = time.perf_counter()
+        headers = {}
+        previous = validators.get(url) or {}
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+        html, text, reason = None, None, None
+        url_stats = {"not_modified": False, "etag": None, "last_modified": None, "charset": None}
+        try:
+            response = session.get(url, headers=headers, timeout=timeout)
+            url_stats.update(etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"))
+            if response.status_code == 304:
+                url_stats.update(not_modified=True, etag=previous.get("etag"),
+                                 last_modified=previous.get("last_modified"))
+            elif response.status_code >= 400:
+                reason = f"HTTP {response.status_code}"
+            elif "html" not in response.headers.get("Content-Type", "html"):
+                reason = f"non-HTML response ({response.headers['Content-Type']})"
+            else:
+                # Raw bytes: response.text guesses ISO-8859-1 when the header names no charset
+                html = response.content
+                charset = HEADER_CHARSET.search(response.headers.get("Content-Type", ""))
+                url_stats["charset"] = charset.group(1) if charset else None
+                markup = decode_html(html, url_stats["charset"])
+                text = extract_visible_text(markup)
+                reason = browser_fallback_reason(markup, text, min_text_chars)
+        except requests.RequestException as e:
+            reason = f"{type(e).__name__}: {e}"
+        except Exception as e:
+            # Anything the parser chokes on is left to the browser render of this URL
+            reason = f"text extraction failed: {type(e).__name__}: {e}"
+        url_stats.update(static_seconds=round(time.perf_counter() - start, 3), fallback_reason=reason)
+        return url, (None if reason or text is None else (html, text)), url_stats
+
+    pages, stats = {}, {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for url, page, url_stats in executor.map(fetch, urls):
+            if page is not None:
+                pages[url] = page
+            stats[url] = url_stats
+    return pages, stats
+
+
+async def _block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def _render_page(browser, url: str, timeout_ms: int, block_resources: bool) -> str:
+    context = await browser.new_context()
+    try:
+        if block_resources:
+            await context.route("**/*", _block_heavy_resources)
+        page = await context.new_page()
+        await page.goto(url, timeout=timeout_ms, wait_until="domcontentloaded")
+        return await page.content()
+    finally:
+        await context.close()
+
+
+async def scrape_urls_async(urls: list, browsers: int = 2, concurrency: int = 8,
+                            timeout_ms: int = 15000, block_resources: bool = True) -> tuple:
+    """Render every URL and return ({url: html or None}, {url: {"seconds", "error"}})."""
+    from playwright.async_api import async_playwright
+
+    results, stats = {}, {}
+    if not urls:
+        return results, stats
+
+    semaphore = asyncio.Semaphore(concurrency)
+    async with async_playwright() as p:
+        pool = [await p.chromium.launch(headless=True) for _ in range(max(1, min(browsers, len(urls))))]
+        browser_cycle = itertools.cycle(pool)
+
+        async def fetch(url):
+            async with semaphore:
+                browser = next(browser_cycle)
+                start = time.perf_counter()
+                error = None
+                try:
+                    # Backstop for hangs outside page.goto (context setup, content serialisation)
+                    results[url] = await asyncio.wait_for(
+                        _render_page(browser, url, timeout_ms, block_resources), timeout_ms / 1000 * 2
+                    )
+                except Exception as e:
+                    results[url] = None
+                    error = f"{type(e).__name__}: {e}"
+                    print(f"Error loading page for {url}: {error}")
+                stats[url] = {"seconds": round(time.perf_counter() - start, 3), "error": error}
+
+        try:
+            await asyncio.gather(*(fetch(url) for url in urls))
+        finally:
+            for browser in pool:
+                await browser.close()
+
+    return results, stats
+
+
+def scrape_urls(urls: list, **kwargs) -> tuple:
+    """Synchronous wrapper around scrape_urls_async for the ingest pipeline."""
+    return asyncio.run(scrape_urls_async(list(urls), **kwargs))
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def fetch_web_pages(urls: list, previous: dict = None, html_store=None, static_first: bool = True,
+                    min_text_chars: int = MIN_STATIC_TEXT_CHARS, static_workers: int = 16,
+                    **browser_kwargs) -> tuple:
+    """Fetch the visible text of every URL, rendering in a browser only when needed.
+
+    With ``previous`` (url -> page entry from an earlier run) requests are conditional:
+    pages answering 304 or whose text hashes the same are kept as they were, and pages
+    that fail keep their previous entry rather than disappearing. With ``html_store``
+    (an html_store.HtmlStore) the raw HTML of every fetched page is kept so text can be
+    re-extracted later without fetching again.
+
+    Returns ({url: page entry or None}, {url: stats}). A page entry holds text,
+    content_hash, etag, last_modified, path, fetched_at and extractor. Stats record the
+    path taken ("static", "browser", "not_modified" or "failed"), whether the page is
+    new, changed or unchanged, why it fell back to the browser and how long each step took.
+    """
+    urls = list(urls)
+    previous = previous or {}
+    texts, htmls, stats = {}, {}, {}
+    # Conditional GETs are cheap, so refreshes always start with one even in browser-only mode
+    conditional = [url for url in urls if url in previous]
+    static_urls = urls if static_first else conditional
+    if static_urls:
+        static_pages, stats = fetch_static_pages(static_urls, validators=previous, workers=static_workers,
+                                                 min_text_chars=min_text_chars)
+        if static_first:
+            htmls = {url: html for url, (html, _) in static_pages.items()}
+            texts = {url: text for url, (_, text) in static_pages.items()}
+    for url in texts:
+        stats[url].update(path="static", seconds=stats[url]["static_seconds"])
+    for url in conditional:
+        if stats[url]["not_modified"]:
+            stats[url].update(path="not_modified", seconds=stats[url]["static_seconds"])
+
+    fallback = [url for url in urls if url not in texts and not stats.get(url, {}).get("not_modified")]
+    if fallback:
+        pages, render_stats = scrape_urls(fallback, **browser_kwargs)
+        for url in fallback:
+            url_stats = stats.setdefault(url, {"static_seconds": 0.0, "fallback_reason": "static fetch disabled",
+                                               "not_modified": False, "etag": None, "last_modified": None,
+                                               "charset": None})
+            render = render_stats.get(url, {"seconds": 0.0, "error": "not rendered"})
+            html = pages.get(url)
+            error = render["error"]
+            if html:
+                try:
+                    texts[url] = extract_visible_text(html)
+                    htmls[url] = html
+                except Exception as e:
+                    html = None
+                    error = f"text extraction failed: {type(e).__name__}: {e}"
+                    print(f"Error extracting text for {url}: {error}")
+            url_stats.update(
+                path="browser" if html else "failed",
+                render_seconds=render["seconds"],
+                seconds=round(url_stats["static_seconds"] + render["seconds"], 3),
+                error=error,
+            )
+
+    now = time.time()
+    entries = {}
+    for url in urls:
+        url_stats, old = stats[url], previous.get(url)
+        if url in texts:
+            digest = content_hash(texts[url])
+            entries[url] = {
+                "text": texts[url],
+                "content_hash": digest,
+                "etag": url_stats["etag"],
+                "last_modified": url_stats["last_modified"],
+                "path": url_stats["path"],
+                "fetched_at": now,
+                "extractor": EXTRACTOR_VERSION,
+            }
+            if html_store is not None:
+                html_store.put(url, htmls[url], charset=url_stats["charset"])
+            url_stats["change"] = "new" if not old else ("unchanged" if old["content_hash"] == digest else "changed")
+        elif old:
+            # 304, or a failed fetch where a stale page beats a missing one
+            entries[url] = dict(old, fetched_at=now) if url_stats["not_modified"] else old
+            url_stats["change"] = "unchanged" if url_stats["not_modified"] else "failed"
+        else:
+            entries[url] = None
+            url_stats["change"] = "failed"
+        url_stats["text_chars"] = len(entries[url]["text"]) if entries[url] else 0
+    return entries, stats
@@ -1,23 +1,24 @@
 """
 WeWork Chatbot Enhanced Prompt Template
 This file contains the comprehensive prompt template for the WeWork chatbot.
+
+The fixed instructions are the system message and never change between requests;
+the retrieved chunks and the question follow in a short user message. OpenAI caches
+prompt prefixes of 1024 tokens or more, so every request after the first reuses the
+cached system prompt and is billed (and prefilled) only for the dynamic part.
+Keep anything request-specific out of WEWORK_SYSTEM_PROMPT, or the cache never hits.
+
+test_gpt4o_prompt_prefix.py checks that two real requests share a byte-identical
+prefix; run this file for its size and fingerprint.
 """
 
-def get_wework_prompt(question: str, chunks_retrieved: str) -> str:
-    """
-    Generate the comprehensive WeWork chatbot prompt with the provided question and chunks.
-    
-    Args:
-        question: The user's question
-        chunks_retrieved: The relevant context chunks from the RAG system
-        
-    Returns:
-        str: The complete prompt for the Gemini model
-    """
-    
-    prompt = f"""### WeWork Chatbot Response Generation
+import hashlib
+
+WEWORK_SYSTEM_PROMPT = """You are a helpful WeWork customer service assistant.
 
-Utilizing the information in 'chunks': {chunks_retrieved}, provide an accurate and concise response to the user's question ({question}). Follow these step-by-step instructions to ensure accuracy and clarity.
+### WeWork Chatbot Response Generation
+
+Utilizing the information in 'chunks' (sent with the user's question in the user message), provide an accurate and concise response to the user's question. Follow these step-by-step instructions to ensure accuracy and clarity.
 
 ---
 ### Scope Restriction & Jailbreak Protection (MANDATORY)
@@ -83,7 +84,7 @@ c. Do NOT attempt to retrieve or guess information from chunks for these inputs.
 
 #### 2. Information Retrieval
 a. Extract Relevant Information from Chunks (chunks):  
-- Identify key details that directly address {question}.  
+- Identify key details that directly address the user's question.  
 - If the question involves discounts, promotions, percentages, or dates, prioritize extracting specific numeric values or named offers exactly as mentioned in the 'chunks'.  
 - If the question asks for buildings, only extract names that refer to actual physical buildings (e.g., 'Vaishnavi Signature', 'Embassy TechVillage') and exclude entries that are areas, localities, or generic space names (e.g., 'WeWork Indiranagar', 'Koramangala').
 b. Combine Both Sources: If information is present in both, intelligently merge them to form a complete response.
@@ -244,8 +245,43 @@ List of Offerings:
   - Business Solutions - Contact Form - https://wework.co.in/business-solutions/#get-in-touch 
 - Growth Campus
   - Growth Campus - Product Info - https://wework.co.in/labs/growthcampus/
-  - Growth Campus - Contact Form - https://wework.co.in/labs/growthcampus/#growthCampusForm
+  - Growth Campus - Contact Form - https://wework.co.in/labs/growthcampus/#growthCampusForm"""
 
-Answer:"""
+
+def get_wework_user_message(question: str, chunks_retrieved: str) -> str:
+    """
+    The per-request part of the prompt: the retrieved chunks and the user's question.
     
-    return prompt
+    Args:
+        question: The user's question
+        chunks_retrieved: The relevant context chunks from the RAG system
+        
+    Returns:
+        str: The user message that follows WEWORK_SYSTEM_PROMPT
+    """
+    return f"""chunks:
+{chunks_retrieved}
+
+User question: {question}
+
+Answer:"""
+
+
+def get_wework_messages(question: str, chunks_retrieved: str) -> list:
+    """Chat messages for the model: the static system prompt first, then the dynamic user message."""
+    return [
+        {"role": "system", "content": WEWORK_SYSTEM_PROMPT},
+        {"role": "user", "content": get_wework_user_message(question, chunks_retrieved)}
+    ]
+
+
+def prompt_prefix_fingerprint() -> str:
+    """sha256 of the static prefix; it must be the same for every request."""
+    return hashlib.sha256(WEWORK_SYSTEM_PROMPT.encode('utf-8')).hexdigest()
+
+
+if __name__ == "__main__":
+    # Prefix stability is tested on real requests in test_gpt4o_prompt_prefix.py
+    suffix = get_wework_user_message("What is a private office?", "Chunk 1:\nA private office is a lockable room.")
+    print(f"Static prefix:  {len(WEWORK_SYSTEM_PROMPT.encode('utf-8')):6d} bytes, sha256 {prompt_prefix_fingerprint()[:16]}")
+    print(f"Dynamic suffix: {len(suffix.encode('utf-8')):6d} bytes for a one-chunk request")
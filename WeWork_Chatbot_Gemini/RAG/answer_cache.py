@@ -0,0 +1,115 @@
+"""
+Semantic Answer Cache
+Serves a stored LLM answer when a new question is close enough to one that was already answered.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Size-bounded LRU/TTL cache of answers keyed on query embeddings.
+
+    A lookup returns the cached answer whose query embedding has the highest cosine
+    similarity with the new query, provided it reaches ``similarity_threshold`` and was
+    stored under the same ``scope`` (e.g. the cities, buildings and products the query
+    names, which embeddings barely separate).
+
+    Entries are tagged with the index version their answer was retrieved from. With
+    ``current_version`` (a callable returning the active version), answers from any
+    other version are never served, and an answer generated against an index that was
+    replaced while the LLM was running is rejected by put().
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600, similarity_threshold: float = 0.95,
+                 current_version=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.current_version = current_version or (lambda: None)
+
+        self._entries = OrderedDict()  # key -> (unit embedding, answer, created_at, version, scope)
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale = 0
+
+    @staticmethod
+    def _normalise(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now: float, version):
+        expired = [key for key, (_, _, created_at, _, _) in self._entries.items()
+                   if now - created_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        self.evictions += len(expired)
+        stale = [key for key, entry in self._entries.items() if entry[3] != version]
+        for key in stale:
+            del self._entries[key]
+        self.stale += len(stale)
+
+    def get(self, embedding, scope=()):
+        """Return the cached answer for a semantically equivalent query with the same scope, or None."""
+        vector = self._normalise(embedding)
+        scope = tuple(scope)
+        with self._lock:
+            self._expire(time.time(), self.current_version())
+            keys = [key for key, entry in self._entries.items() if entry[4] == scope]
+            if keys:
+                matrix = np.stack([self._entries[key][0] for key in keys])
+                similarities = matrix @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.hits += 1
+                    return self._entries[keys[best]][1]
+            self.misses += 1
+            return None
+
+    def put(self, embedding, answer: str, version=None, scope=()):
+        """Store an answer retrieved from index ``version``, evicting the least recently used entry when full.
+
+        Dropped if ``version`` is no longer the active one.
+        """
+        vector = self._normalise(embedding)
+        with self._lock:
+            if version != self.current_version():
+                self.stale += 1
+                return
+            self._entries[self._next_key] = (vector, answer, time.time(), version, tuple(scope))
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached answer, e.g. after the knowledge base is rebuilt."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale": self.stale,
+            }
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+ASGI API for WeWork Optimized RAG System
+Async serving path with the same endpoints as flask_api.py. The Gemini call is awaited
+on the event loop instead of holding a thread for its whole duration, so one process
+keeps hundreds of conversations in flight; retrieval (query embedding, vector and BM25
+search) is CPU work and runs on a bounded thread pool. Every /chat has a deadline.
+
+Run with:
+    uvicorn asgi_api:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import os
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
+
+# Shared with flask_api.py; imports the RAG components and starts the cold-start clock
+import chat_service
+from chat_service import first_token_stats, retrieve_for_query, remember_answer
+from optimized_rag import generate_answer_with_gemini_async, stream_answer_with_gemini_async
+from streaming import SSE_HEADERS, until_deadline
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Quart app setup
+app = cors(Quart(__name__))
+
+# Seconds a /chat may take end to end; past it the client gets a 504 and the LLM call is cancelled
+CHAT_DEADLINE = float(os.getenv("WEWORK_CHAT_DEADLINE", "60"))
+# Threads for CPU-bound retrieval; caps how many retrievals run at once
+RETRIEVAL_THREADS = int(os.getenv("WEWORK_RETRIEVAL_THREADS", "0")) or os.cpu_count() or 1
+retrieval_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_THREADS, thread_name_prefix="retrieval")
+
+# Chats being answered right now (/status)
+chats_in_flight = 0
+
+@app.before_serving
+async def start_rag():
+    threading.Thread(target=chat_service.init_rag, daemon=True).start()
+
+async def answer_query(query: str) -> tuple:
+    """Return (response_text, cache_hit) for a query."""
+    loop = asyncio.get_running_loop()
+    cache_key, response_text, context_chunks = await loop.run_in_executor(
+        retrieval_executor, retrieve_for_query, query)
+    cache_hit = response_text is not None
+
+    if not cache_hit:
+        response_text = await generate_answer_with_gemini_async(query, context_chunks)
+        remember_answer(cache_key, response_text)
+    return response_text, cache_hit
+
+@app.route('/health', methods=['GET'])
+async def health_check():
+    """Readiness check: 200 only once this process can answer queries, 503 otherwise."""
+    body, status_code = chat_service.health_body("WeWork RAG API (ASGI)")
+    return jsonify(body), status_code
+
+@app.route('/status', methods=['GET'])
+async def get_status():
+    """Detailed status endpoint."""
+    return jsonify(chat_service.status_body(
+        "WeWork Optimized RAG API (ASGI)",
+        chats_in_flight=chats_in_flight,
+        chat_deadline_seconds=CHAT_DEADLINE,
+        retrieval_threads=RETRIEVAL_THREADS
+    ))
+
+@app.route('/chat', methods=['POST'])
+async def chat():
+    """Process chatbot queries using the optimized RAG system."""
+    global chats_in_flight
+    error = chat_service.unavailable()
+    if error:
+        return jsonify(error), 503
+
+    data = await request.get_json()
+    query = chat_service.query_from(data)
+    membership_type = data.get('membership_type', 'General')
+
+    if not query:
+        return jsonify(chat_service.NO_QUERY_ERROR), 400
+
+    chats_in_flight += 1
+    try:
+        start_time = time.time()
+        logger.info(f"Processing query: '{query}' (membership: {membership_type})")
+
+        # A retrieval already running on the pool finishes in the background; the LLM call is cancelled
+        response_text, cache_hit = await asyncio.wait_for(answer_query(query), CHAT_DEADLINE)
+
+        processing_time = time.time() - start_time
+        logger.info(f"Query processed in {processing_time:.2f} seconds")
+        chat_service.mark_first_chat()
+
+        return jsonify({
+            "response": response_text,
+            "success": True,
+            "metadata": chat_service.chat_metadata(query, response_text, membership_type, cache_hit, processing_time)
+        })
+
+    except asyncio.TimeoutError:
+        logger.warning(f"Query exceeded the {CHAT_DEADLINE:.0f}s deadline: '{query}'")
+        return jsonify(chat_service.timeout_body(CHAT_DEADLINE)), 504
+    except Exception as e:
+        logger.error(f"Error processing chat query: {e}", exc_info=True)
+        return jsonify(chat_service.error_body(e)), 500
+    finally:
+        chats_in_flight -= 1
+
+@app.route('/chat/stream', methods=['POST'])
+async def chat_stream():
+    """Like /chat, but streams the answer as Server-Sent Events (same events as flask_api.py).
+
+    The chat deadline covers the whole stream; past it the stream ends with an error event.
+    """
+    error = chat_service.unavailable()
+    if error:
+        return jsonify(error), 503
+
+    data = await request.get_json()
+    query = chat_service.query_from(data)
+    membership_type = data.get('membership_type', 'General')
+
+    if not query:
+        return jsonify(chat_service.NO_QUERY_ERROR), 400
+
+    async def generate():
+        global chats_in_flight
+        chats_in_flight += 1
+        start_time = time.time()
+        deadline = time.monotonic() + CHAT_DEADLINE
+        logger.info(f"Streaming query: '{query}' (membership: {membership_type})")
+        try:
+            cache_key, response_text, context_chunks = await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(retrieval_executor, retrieve_for_query, query),
+                CHAT_DEADLINE)
+            cache_hit = response_text is not None
+
+            if cache_hit:
+                ttft = time.time() - start_time
+                first_token_stats.record_cached()
+                yield chat_service.token_event(response_text)
+            else:
+                ttft = None
+                parts = []
+                async for text in until_deadline(stream_answer_with_gemini_async(query, context_chunks), deadline):
+                    if ttft is None:
+                        ttft = time.time() - start_time
+                        first_token_stats.record(ttft)
+                    parts.append(text)
+                    yield chat_service.token_event(text)
+                response_text = "".join(parts).strip()
+                remember_answer(cache_key, response_text)
+
+            processing_time = time.time() - start_time
+            logger.info(f"Query streamed in {processing_time:.2f} seconds (first token after {ttft or 0:.2f}s)")
+            chat_service.mark_first_chat()
+
+            yield chat_service.done_event(query, response_text, membership_type, cache_hit, processing_time, ttft)
+
+        except asyncio.TimeoutError:
+            logger.warning(f"Streamed query exceeded the {CHAT_DEADLINE:.0f}s deadline: '{query}'")
+            first_token_stats.record_error()
+            yield chat_service.error_event(chat_service.timeout_body(CHAT_DEADLINE))
+        except Exception as e:
+            logger.error(f"Error streaming chat query: {e}", exc_info=True)
+            first_token_stats.record_error()
+            yield chat_service.error_event(chat_service.error_body(e))
+        finally:
+            chats_in_flight -= 1
+
+    response = Response(generate(), mimetype='text/event-stream', headers=SSE_HEADERS)
+    # Bounded by CHAT_DEADLINE instead of Quart's response timeout
+    response.timeout = None
+    return response
+
+@app.route('/retrieve', methods=['POST'])
+async def retrieve():
+    """Return the chunks retrieved for a query without calling the LLM (debugging and load tests)."""
+    error = chat_service.unavailable()
+    if error:
+        return jsonify(error), 503
+
+    query = chat_service.query_from(await request.get_json())
+    if not query:
+        return jsonify(chat_service.NO_QUERY_ERROR), 400
+
+    body = await asyncio.get_running_loop().run_in_executor(retrieval_executor, chat_service.retrieve_body, query)
+    return jsonify(body)
+
+@app.route('/rebuild', methods=['POST'])
+async def rebuild_knowledge_base():
+    """Rebuild the knowledge base without downtime (same parameters as flask_api.py)."""
+    body, status_code = chat_service.start_rebuild(request.args)
+    return jsonify(body), status_code
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=5000)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Prompt Cache Benchmark
+Measures the input-token and latency savings of sending the WeWork guidelines as a
+byte-stable system instruction (complete_gemini_prompt.GEMINI_SYSTEM_PROMPT) ahead of
+the per-request context and question.
+
+Two layouts are sent to Gemini with the same questions:
+  split   - guidelines as the system instruction, then the context and question (what the API sends)
+  dynamic - context and question first, then the same guidelines in one prompt, as the old
+            template did; the prefix changes on every request, so the provider cache cannot hit
+
+For each layout it reports prompt tokens, tokens served from Gemini's implicit prompt
+cache, the equivalent billed input tokens and time to first token. Implicit caching
+needs a model that supports it (Gemini 2.5 and later); with older models both layouts
+report no cached tokens. Needs GEMINI_API_KEY.
+
+Usage:
+    python benchmark_prompt_cache.py [--model gemini-2.5-flash] [--requests 10] [--max-tokens 16]
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from complete_gemini_prompt import GEMINI_SYSTEM_PROMPT, get_complete_gemini_prompt, prompt_prefix_fingerprint
+
+SAMPLE_QUESTIONS = [
+    "What is a private office?",
+    "How much does All Access cost?",
+    "Can I cancel a conference room booking?",
+    "What are the day pass timings?",
+    "Which cities is WeWork in?",
+    "Is there a discount on All Access Plus?",
+]
+
+SAMPLE_CHUNKS = """Chunk 1:
+A private office is a fully furnished, lockable office for teams of any size, with access to shared amenities.
+
+Chunk 2:
+Day pass members have access from 9am to 8pm Monday to Friday and 10am to 4pm on Saturdays."""
+
+# Gemini bills implicitly cached prompt tokens at a quarter of the input price
+CACHED_TOKEN_PRICE = 0.25
+
+
+def send(model, prompt: str, max_tokens: int) -> dict:
+    """Stream one response. Returns prompt_tokens, cached_tokens and ttft (seconds)."""
+    start = time.perf_counter()
+    ttft = None
+    chunk = None
+    for chunk in model.generate_content(prompt, stream=True,
+                                        generation_config={"max_output_tokens": max_tokens, "temperature": 0.15}):
+        if ttft is None and chunk.parts:
+            ttft = time.perf_counter() - start
+    usage = chunk.usage_metadata
+    return {
+        "prompt_tokens": usage.prompt_token_count,
+        "cached_tokens": getattr(usage, "cached_content_token_count", 0) or 0,
+        "ttft": ttft if ttft is not None else time.perf_counter() - start,
+    }
+
+
+def report(layout: str, results: list) -> float:
+    prompt_tokens = sum(result["prompt_tokens"] for result in results)
+    cached_tokens = sum(result["cached_tokens"] for result in results)
+    billed = prompt_tokens - cached_tokens * (1 - CACHED_TOKEN_PRICE)
+    ttfts = [result["ttft"] for result in results]
+    print(f"{layout}:")
+    print(f"  prompt tokens / request  {prompt_tokens / len(results):8.0f}")
+    print(f"  cached tokens / request  {cached_tokens / len(results):8.0f}  ({cached_tokens / prompt_tokens:.0%})")
+    print(f"  billed input / request   {billed / len(results):8.0f}")
+    print(f"  ttft p50                 {statistics.median(ttfts) * 1000:8.0f} ms")
+    return billed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # The API uses optimized_rag.GEMINI_MODEL_NAME
+    parser.add_argument("--model", default="gemini-1.5-flash-latest")
+    parser.add_argument("--requests", type=int, default=10, help="measured requests per layout")
+    parser.add_argument("--max-tokens", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"Static prefix: {len(GEMINI_SYSTEM_PROMPT.encode('utf-8'))} bytes, sha256 {prompt_prefix_fingerprint()[:16]}")
+
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    models = {
+        "dynamic": genai.GenerativeModel(args.model),
+        "split": genai.GenerativeModel(args.model, system_instruction=GEMINI_SYSTEM_PROMPT),
+    }
+    questions = [SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)] for i in range(args.requests)]
+
+    def build_prompt(layout: str, question: str) -> str:
+        prompt = get_complete_gemini_prompt(question, SAMPLE_CHUNKS)
+        return prompt if layout == "split" else prompt + "\n\n" + GEMINI_SYSTEM_PROMPT
+
+    billed = {}
+    for layout, model in models.items():
+        # One unmeasured request so the split layout starts with its prefix cached, as in steady state
+        send(model, build_prompt(layout, questions[0] + " (warm-up)"), args.max_tokens)
+        results = [send(model, build_prompt(layout, f"{question} (request {i})"), args.max_tokens)
+                   for i, question in enumerate(questions)]
+        billed[layout] = report(layout, results)
+
+    print(f"Billed input tokens saved by the split layout: {1 - billed['split'] / billed['dynamic']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
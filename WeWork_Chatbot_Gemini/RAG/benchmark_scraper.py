@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Scraper Benchmark
+Compares the legacy scraper (one Chromium launch per URL on a 12-thread pool), the
+pooled async scraper and the static-first fetcher (HTTP GET + lxml, browser fallback),
+against a local HTTP server serving fixture pages, so results do not depend on the
+live site.
+
+Half of the fixture pages are server-rendered; the other half build their text with
+JavaScript, like the pages that need a browser in the first place.
+
+Peak memory is the combined RSS of this process and every browser process it spawns,
+sampled from /proc (Linux only).
+
+Usage:
+    python benchmark_scraper.py [--pages 60] [--latency-ms 50] [--browsers 2] [--concurrency 8]
+"""
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from web_scraper import fetch_web_pages, scrape_urls
+
+PARAGRAPH = ("WeWork All Access Plus gives members access to every WeWork location in the city, "
+             "with meeting room credits, printing and high-speed internet included. ")
+
+
+def fixture_page(index: int) -> bytes:
+    body = f"<h1>Fixture page {index}</h1>" + f"<p>{PARAGRAPH}</p>" * 20
+    if index % 2:
+        # Client-rendered: the text only exists after the script runs
+        script = body.replace("\\", "\\\\").replace("'", "\\'")
+        body = f"<div id='app'></div><script>document.getElementById('app').innerHTML = '{script}';</script>"
+    return f"<!doctype html><html><head><title>Page {index}</title></head><body>{body}</body></html>".encode()
+
+
+def start_fixture_server(pages: int, latency_ms: int) -> ThreadingHTTPServer:
+    content = {f"/page/{i}": fixture_page(i) for i in range(pages)}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency_ms / 1000)
+            html = content.get(self.path)
+            self.send_response(200 if html else 404)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.end_headers()
+            self.wfile.write(html or b"not found")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def process_tree_rss_mb(root_pid: int) -> float:
+    """Sum VmRSS over root_pid and all of its descendants."""
+    children, rss = {}, {}
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{pid}/status") as f:
+                kb = next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0)
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(pid))
+        rss[int(pid)] = kb
+
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total / 1024
+
+
+def measure(fn) -> tuple:
+    """Run fn while sampling process-tree RSS. Returns (result, seconds, peak RSS MB)."""
+    peak = [process_tree_rss_mb(os.getpid())]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.1):
+            peak[0] = max(peak[0], process_tree_rss_mb(os.getpid()))
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        seconds = time.perf_counter() - start
+        done.set()
+        sampler.join()
+    return result, seconds, peak[0]
+
+
+def legacy_scrape(urls: list, timeout_ms: int) -> dict:
+    """The previous engine: a fresh sync Playwright + Chromium per URL on 12 threads."""
+    from playwright.sync_api import sync_playwright
+
+    def fetch(url):
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            try:
+                page = browser.new_page()
+                page.goto(url, timeout=timeout_ms)
+                page.wait_for_load_state('domcontentloaded', timeout=timeout_ms)
+                return page.content()
+            except Exception:
+                return None
+            finally:
+                browser.close()
+
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        return dict(zip(urls, executor.map(fetch, urls)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--latency-ms", type=int, default=50, help="artificial server latency per request")
+    parser.add_argument("--browsers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout-ms", type=int, default=15000)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    server = start_fixture_server(args.pages, args.latency_ms)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base_url}/page/{i}" for i in range(args.pages)]
+    print(f"Serving {args.pages} fixture pages at {base_url} ({args.latency_ms} ms latency)")
+
+    engines = {
+        "pooled async": lambda: scrape_urls(urls, browsers=args.browsers, concurrency=args.concurrency,
+                                            timeout_ms=args.timeout_ms)[0],
+        "static-first": lambda: {url: page and page["text"] for url, page in fetch_web_pages(
+            urls, browsers=args.browsers, concurrency=args.concurrency, timeout_ms=args.timeout_ms)[0].items()},
+    }
+    if not args.skip_legacy:
+        engines = {"legacy": lambda: legacy_scrape(urls, args.timeout_ms), **engines}
+
+    print(f"\n{'engine':<14}{'seconds':>9}{'pages/s':>9}{'peak RSS MB':>13}{'rendered':>10}")
+    for name, engine in engines.items():
+        pages, seconds, peak_rss = measure(engine)
+        # Client-rendered pages only count if the script output made it into the HTML / text
+        rendered = sum(1 for page in pages.values() if page and "Fixture page" in page)
+        print(f"{name:<14}{seconds:>9.2f}{len(urls) / seconds:>9.1f}{peak_rss:>13.0f}{rendered:>7}/{len(urls)}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
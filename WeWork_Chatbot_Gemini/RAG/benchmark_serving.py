@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Serving Benchmark
+Measures request throughput and latency of a running API, to compare the single-process
+development server (python flask_api.py) with pre-fork serving (gunicorn -c gunicorn.conf.py).
+
+By default it posts to /retrieve, which runs the whole retrieval path (query embedding,
+vector search, BM25, fusion) but no LLM call, so results reflect the server rather than
+the LLM provider. Use --path /chat to include generation, or --path /chat/stream to
+also report time to first token. Each query is made unique
+so the query embedding cache does not hide encoder cost; --repeat sends the sample
+queries as they are.
+
+Usage:
+    python benchmark_serving.py [--url http://localhost:5000] [--path /retrieve] [--concurrency 16] [--requests 400]
+"""
+
+import argparse
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+SAMPLE_QUERIES = [
+    "What is a private office?",
+    "How much does All Access cost?",
+    "What does PO stand for?",
+    "Can I book meeting rooms with a virtual office?",
+    "What is the difference between All Access and All Access Plus?",
+    "Which amenities are included in a dedicated desk?",
+    "How do I add a team member to my membership?",
+    "Is there a discount on All Access Plus?",
+]
+
+
+def wait_until_ready(url: str, timeout: float):
+    """Poll /health until it returns 200."""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=5) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, OSError):
+            pass
+        if time.time() > deadline:
+            raise SystemExit(f"{url} did not become ready within {timeout:.0f}s")
+        time.sleep(1)
+
+
+def post(url: str, query: str, timeout: float) -> tuple:
+    """POST one query. Returns (ok, seconds, seconds to the first token event or None)."""
+    request = urllib.request.Request(url, data=json.dumps({"query": query}).encode(),
+                                     headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    first_token = None
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            ok = response.status == 200
+            if response.headers.get_content_type() == "text/event-stream":
+                for line in response:
+                    if first_token is None and line.startswith(b"event: token"):
+                        first_token = time.perf_counter() - start
+                    elif line.startswith(b"event: error"):
+                        ok = False
+            else:
+                response.read()
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return ok, time.perf_counter() - start, first_token
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--path", default="/retrieve")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--warmup", type=int, default=20, help="requests sent before measuring")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--repeat", action="store_true", help="do not make queries unique (allows cache hits)")
+    args = parser.parse_args()
+
+    wait_until_ready(args.url, args.timeout)
+    endpoint = args.url + args.path
+    queries = [SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)] for i in range(args.requests + args.warmup)]
+    if not args.repeat:
+        queries = [f"{query} (request {i})" for i, query in enumerate(queries)]
+    warmup, queries = queries[:args.warmup], queries[args.warmup:]
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(lambda query: post(endpoint, query, args.timeout), warmup))
+
+        start = time.perf_counter()
+        results = list(executor.map(lambda query: post(endpoint, query, args.timeout), queries))
+        seconds = time.perf_counter() - start
+
+    latencies = [latency for ok, latency, _ in results if ok]
+    first_tokens = [first_token for ok, _, first_token in results if ok and first_token is not None]
+    errors = len(results) - len(latencies)
+    print(f"{endpoint}: {len(results)} requests, concurrency {args.concurrency}")
+    print(f"  throughput  {len(latencies) / seconds:8.1f} req/s")
+    if latencies:
+        print(f"  latency p50 {statistics.median(latencies) * 1000:8.1f} ms")
+        print(f"  latency p95 {percentile(latencies, 0.95) * 1000:8.1f} ms")
+        print(f"  latency p99 {percentile(latencies, 0.99) * 1000:8.1f} ms")
+    if first_tokens:
+        print(f"  ttft p50    {statistics.median(first_tokens) * 1000:8.1f} ms")
+        print(f"  ttft p95    {percentile(first_tokens, 0.95) * 1000:8.1f} ms")
+    print(f"  errors      {errors:8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Vector Store Benchmark
+Compares the Chroma backend with the in-process NumPy backends on the local knowledge base.
+
+Usage:
+    python benchmark_vector_store.py [--repeats 20] [--k 8]
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+from langchain_community.vectorstores import Chroma
+
+import optimized_rag
+from numpy_store import NumpyVectorStore
+
+SAMPLE_QUERIES = [
+    "what is po",
+    "discount on all access plus",
+    "what is the price of private office",
+    "how do I book a meeting room on demand",
+    "virtual office address for gst registration",
+    "wifi not working in my private office",
+    "how do I pay my invoice",
+    "wework centers in bangalore",
+]
+
+
+def time_ms(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--k", type=int, default=8)
+    args = parser.parse_args()
+
+    pages = optimized_rag.load_local_files()
+    chunks = optimized_rag.split_documents(pages)
+    texts = [chunk.page_content for chunk in chunks]
+    metadatas = [chunk.metadata for chunk in chunks]
+    ids = [f"chunk-{i}" for i in range(len(chunks))]
+    print(f"Embedding {len(chunks)} chunks once for all backends...")
+    vectors = optimized_rag.embedding_model.embed_documents(texts)
+    query_vectors = optimized_rag.embedding_model.embed_queries(SAMPLE_QUERIES)
+
+    stores = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        chroma = Chroma(persist_directory=f"{tmp}/chroma", embedding_function=optimized_rag.embedding_model)
+        chroma._collection.add(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+        stores["chroma"] = (chroma, time.perf_counter() - start)
+
+        for name, quantize in (("numpy", False), ("numpy_int8", True)):
+            start = time.perf_counter()
+            store = NumpyVectorStore(optimized_rag.embedding_model, persist_directory=f"{tmp}/{name}", quantize=quantize)
+            store.add_embeddings(texts, vectors, metadatas, ids)
+            store.persist()
+            # Reopen so searches run against the memory-mapped file, as in production
+            store = NumpyVectorStore(optimized_rag.embedding_model, persist_directory=f"{tmp}/{name}")
+            stores[name] = (store, time.perf_counter() - start)
+
+        reference = [[doc.page_content for doc in hits]
+                     for hits in optimized_rag._search_by_vectors(chroma, query_vectors, args.k)]
+
+        print(f"\n{'backend':<12}{'build s':>10}{'single ms':>12}{'batch ms':>12}{'top-k overlap':>16}")
+        for name, (store, build_seconds) in stores.items():
+            single = lambda: [store.similarity_search_by_vector(v, k=args.k) for v in query_vectors]
+            if name == "chroma":
+                batch = lambda: optimized_rag._search_by_vectors(store, query_vectors, args.k)
+            else:
+                batch = lambda: store.similarity_search_by_vectors(query_vectors, args.k)
+            results = batch()
+            overlap = statistics.mean(
+                len({doc.page_content for doc in hits} & set(ref)) / max(len(ref), 1)
+                for hits, ref in zip(results, reference)
+            )
+            print(f"{name:<12}{build_seconds:>10.2f}{time_ms(single, args.repeats):>12.2f}"
+                  f"{time_ms(batch, args.repeats):>12.2f}{overlap:>16.2%}")
+
+    print(f"\nTimings are medians over {args.repeats} runs of {len(SAMPLE_QUERIES)} queries.")
+
+
+if __name__ == "__main__":
+    main()
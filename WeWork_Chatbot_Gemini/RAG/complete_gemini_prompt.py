@@ -1,26 +1,20 @@
 """
 Complete Gemini-Optimized WeWork Chatbot Prompt Template
 Includes ALL information from the original GPT-4o prompt, adapted for Gemini's processing style.
-"""
 
-def get_complete_gemini_prompt(question: str, chunks_retrieved: str) -> str:
-    """
-    Generate a complete Gemini-optimized WeWork chatbot prompt with all original features.
-    
-    Args:
-        question: The user's question
-        chunks_retrieved: The relevant context chunks from the RAG system
-        
-    Returns:
-        str: The complete prompt optimized for Gemini with all original features
-    """
-    
-    prompt = f"""You are a WeWork customer service assistant. Use the context below to answer the user's question following these comprehensive guidelines:
+The guidelines are the model's system instruction and never change between requests;
+only the retrieved context and the question are sent with each request. With Gemini
+models that cache prompt prefixes implicitly (Gemini 2.5 and later) repeated requests
+reuse the cached instruction tokens, and the instruction is not re-sent as part of
+every prompt string. Keep anything request-specific out of GEMINI_SYSTEM_PROMPT.
 
-CONTEXT:
-{chunks_retrieved}
+test_gemini_prompt_prefix.py checks that two real requests share a byte-identical
+prefix; run this file for its size and fingerprint.
+"""
 
-USER QUESTION: {question}
+import hashlib
+
+GEMINI_SYSTEM_PROMPT = """You are a WeWork customer service assistant. Use the CONTEXT sent with each question to answer the user's question following these comprehensive guidelines:
 
 === SECURITY & SCOPE PROTECTION (MANDATORY) ===
 - ONLY respond to WeWork-related questions
@@ -167,8 +161,35 @@ USER QUESTION: {question}
 **Building Names:** Only actual physical buildings, exclude area/locality entries, ensure uniqueness, appropriate link naming
 **Areas/Localities:** Include area names, exclude building names unless asked, area-level links
 
-Use simple, jargon-free language. Base answers ONLY on provided context. Don't invent, infer, guess, or assume information.
+Use simple, jargon-free language. Base answers ONLY on provided context. Don't invent, infer, guess, or assume information."""
 
-ANSWER:"""
+
+def get_complete_gemini_prompt(question: str, chunks_retrieved: str) -> str:
+    """
+    The per-request part of the prompt, sent after GEMINI_SYSTEM_PROMPT (the model's system instruction).
     
-    return prompt
+    Args:
+        question: The user's question
+        chunks_retrieved: The relevant context chunks from the RAG system
+        
+    Returns:
+        str: The retrieved context and the user's question
+    """
+    return f"""CONTEXT:
+{chunks_retrieved}
+
+USER QUESTION: {question}
+
+ANSWER:"""
+
+
+def prompt_prefix_fingerprint() -> str:
+    """sha256 of the static prefix; it must be the same for every request."""
+    return hashlib.sha256(GEMINI_SYSTEM_PROMPT.encode('utf-8')).hexdigest()
+
+
+if __name__ == "__main__":
+    # Prefix stability is tested on real requests in test_gemini_prompt_prefix.py
+    suffix = get_complete_gemini_prompt("What is a private office?", "Chunk 1:\nA private office is a lockable room.")
+    print(f"Static prefix:  {len(GEMINI_SYSTEM_PROMPT.encode('utf-8')):6d} bytes, sha256 {prompt_prefix_fingerprint()[:16]}")
+    print(f"Dynamic suffix: {len(suffix.encode('utf-8')):6d} bytes for a one-chunk request")
@@ -0,0 +1,151 @@
+"""
+Document Store
+Versioned on-disk cache of parsed documents: one UTF-8 text blob, an offset table and
+a JSON manifest with per-document metadata and per-source fingerprints.
+
+The blob and offsets are memory-mapped, so opening the store costs a manifest read
+and page contents are only decoded for the sources that are asked for. The whole
+store is ignored when its format or loader version does not match; individual
+sources are re-parsed when their size, mtime or content hash changes.
+
+Each write goes to a new version directory under the store root and is published by
+atomically replacing current.json, so a crash at any point leaves the previous store
+intact.
+"""
+
+import json
+import mmap
+import os
+import re
+import shutil
+
+import numpy as np
+from langchain_core.documents import Document
+
+FORMAT_VERSION = 1
+TEXTS_FILE = 'texts.bin'
+OFFSETS_FILE = 'offsets.npy'
+MANIFEST_FILE = 'manifest.json'
+CURRENT_FILE = 'current.json'
+VERSION_DIR = re.compile(r'v(\d+)')
+
+
+def current_version(root: str) -> int:
+    """Version published in root/current.json, or None."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), 'r') as f:
+            return json.load(f)["version"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+class DocumentStore:
+    """Read side of a store written by write_document_store().
+
+    ``sources`` maps each source path to its fingerprint (hash, size, mtime_ns),
+    parse_seconds and the [first, first + count) range of its documents.
+    """
+
+    def __init__(self, root: str, loader_version):
+        self.root = root
+        self.loader_version = loader_version
+        self.sources = {}
+        self._metadata = []
+        self._offsets = None
+        self._texts = None
+
+        version = current_version(root)
+        if version is None:
+            return
+        path = os.path.join(root, f"v{version}")
+        with open(os.path.join(path, MANIFEST_FILE), 'r') as f:
+            manifest = json.load(f)
+        if manifest.get("format") != FORMAT_VERSION or manifest.get("loader") != loader_version:
+            print(f"Document store at {root} was written by another loader version, ignoring it")
+            return
+
+        self.sources = manifest["sources"]
+        self._metadata = manifest["metadata"]
+        self._offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode='r')
+        with open(os.path.join(path, TEXTS_FILE), 'rb') as f:
+            # mmap cannot map an empty file
+            self._texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+
+    def __len__(self):
+        return len(self._metadata)
+
+    def cached_hash(self, path: str, stat: os.stat_result) -> str:
+        """The stored content hash when the file's size and mtime are unchanged, else None."""
+        source = self.sources.get(path)
+        if source and source["size"] == stat.st_size and source["mtime_ns"] == stat.st_mtime_ns:
+            return source["hash"]
+        return None
+
+    def document(self, position: int) -> Document:
+        start, end = int(self._offsets[position]), int(self._offsets[position + 1])
+        return Document(page_content=self._texts[start:end].decode('utf-8'), metadata=dict(self._metadata[position]))
+
+    def documents(self, path: str) -> list:
+        source = self.sources[path]
+        return [self.document(position) for position in range(source["first"], source["first"] + source["count"])]
+
+    def close(self):
+        if isinstance(self._texts, mmap.mmap):
+            self._texts.close()
+        self._texts = None
+        self._offsets = None
+
+
+def write_document_store(root: str, loader_version, sources: dict):
+    """Write {path: {"hash", "size", "mtime_ns", "parse_seconds", "docs"}} as a new store at root.
+
+    The store is written to a new version directory and published by replacing
+    current.json, so readers never see a partial store and the previous one stays
+    valid until the switch. Older versions are removed afterwards (open mmaps of
+    them stay readable).
+    """
+    version = (current_version(root) or 0) + 1
+    version_root = os.path.join(root, f"v{version}")
+    # Left over from a write that crashed before publishing
+    shutil.rmtree(version_root, ignore_errors=True)
+    os.makedirs(version_root)
+
+    offsets = [0]
+    metadata = []
+    manifest_sources = {}
+    with open(os.path.join(version_root, TEXTS_FILE), 'wb') as texts:
+        for path, entry in sources.items():
+            manifest_sources[path] = {
+                "hash": entry["hash"],
+                "size": entry["size"],
+                "mtime_ns": entry["mtime_ns"],
+                "parse_seconds": entry.get("parse_seconds"),
+                "first": len(metadata),
+                "count": len(entry["docs"]),
+            }
+            for doc in entry["docs"]:
+                data = doc.page_content.encode('utf-8')
+                texts.write(data)
+                offsets.append(offsets[-1] + len(data))
+                metadata.append(doc.metadata)
+
+    np.save(os.path.join(version_root, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+    with open(os.path.join(version_root, MANIFEST_FILE), 'w') as f:
+        json.dump({"format": FORMAT_VERSION, "loader": loader_version,
+                   "sources": manifest_sources, "metadata": metadata}, f)
+
+    current_path = os.path.join(root, CURRENT_FILE)
+    with open(current_path + '.tmp', 'w') as f:
+        json.dump({"version": version}, f)
+    os.replace(current_path + '.tmp', current_path)
+
+    # Previous versions, and the flat layout of stores written before versioning
+    for name in os.listdir(root):
+        if name == CURRENT_FILE or name == f"v{version}":
+            continue
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and VERSION_DIR.fullmatch(name):
+            shutil.rmtree(path, ignore_errors=True)
+        elif name in (TEXTS_FILE, OFFSETS_FILE, MANIFEST_FILE):
+            os.remove(path)
+    shutil.rmtree(root + '.tmp', ignore_errors=True)
@@ -0,0 +1,104 @@
+"""
+ONNX Embeddings
+Runs the sentence-transformers models from EMBEDDING_OPTIONS through ONNX Runtime,
+optionally int8-quantised, so serving does not need PyTorch.
+
+The model is exported once (this step does need torch, optimum and sentence-transformers)
+into a directory holding model.onnx, model_int8.onnx, tokenizer.json and onnx_config.json.
+"""
+
+import json
+import os
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+ONNX_CONFIG_FILE = 'onnx_config.json'
+FP32_MODEL_FILE = 'model.onnx'
+INT8_MODEL_FILE = 'model_int8.onnx'
+
+
+def export_onnx_model(model_name: str, export_dir: str):
+    """Export a sentence-transformers model to ONNX and write a dynamic int8 copy next to it."""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+    from transformers import AutoTokenizer
+
+    print(f"Exporting {model_name} to ONNX in {export_dir}...")
+    os.makedirs(export_dir, exist_ok=True)
+    ORTModelForFeatureExtraction.from_pretrained(model_name, export=True).save_pretrained(export_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(export_dir)
+
+    quantize_dynamic(
+        os.path.join(export_dir, FP32_MODEL_FILE),
+        os.path.join(export_dir, INT8_MODEL_FILE),
+        weight_type=QuantType.QInt8,
+    )
+
+    # Keep the sentence-transformers pooling and sequence length so vectors match the torch path
+    st_model = SentenceTransformer(model_name, device='cpu')
+    pooling = st_model[1].get_pooling_mode_str()
+    with open(os.path.join(export_dir, ONNX_CONFIG_FILE), 'w') as f:
+        json.dump({"model_name": model_name, "pooling": pooling, "max_length": st_model.max_seq_length}, f, indent=2)
+
+
+class OnnxEmbeddings(Embeddings):
+    """LangChain embeddings backed by an exported ONNX model and a fast tokenizer."""
+
+    def __init__(self, export_dir: str, quantized: bool = False, normalize: bool = True, batch_size: int = 32):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(export_dir, ONNX_CONFIG_FILE), 'r') as f:
+            config = json.load(f)
+        self.model_name = config["model_name"]
+        self.pooling = config["pooling"]
+        self.normalize = normalize
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(export_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=config["max_length"])
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        model_file = INT8_MODEL_FILE if quantized else FP32_MODEL_FILE
+        self.session = ort.InferenceSession(os.path.join(export_dir, model_file), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _encode(self, texts: list) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + self.batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+            hidden = self.session.run(None, feeds)[0]
+            if self.pooling == "cls":
+                pooled = hidden[:, 0]
+            else:
+                mask = attention_mask[..., None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.append(pooled.astype(np.float32))
+        return np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts: list) -> list:
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> list:
+        return self._encode([text])[0].tolist()
+
+
+def load_onnx_embeddings(model_name: str, cache_dir: str, quantized: bool = False) -> OnnxEmbeddings:
+    """Load ONNX embeddings for a model from cache_dir/onnx/<model>, exporting it on first use."""
+    export_dir = os.path.join(cache_dir, 'onnx', model_name.split('/')[-1])
+    if not os.path.exists(os.path.join(export_dir, ONNX_CONFIG_FILE)):
+        export_onnx_model(model_name, export_dir)
+    return OnnxEmbeddings(export_dir, quantized=quantized)
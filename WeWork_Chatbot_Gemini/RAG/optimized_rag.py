@@ -1,24 +1,30 @@
-from langchain_community.document_loaders import (
-    TextLoader,
-)
-import PyPDF2
-import docx2txt
 import json
-from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
 import os
-import pickle
+import fcntl
+import gc
+import hashlib
+import itertools
+import shutil
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
-import google.generativeai as genai
 from dotenv import load_dotenv
 import re
+import sys
+
+from chunk_embedding_cache import ChunkEmbeddingCache
+from embedding_cache import CachedQueryEmbeddings, LazyEmbeddings
+from numpy_store import NumpyVectorStore
+from lexical_index import BM25Index, find_phrases, reciprocal_rank_fusion, tokenize
+from web_scraper import EXTRACTOR_VERSION, content_hash, extract_visible_text, fetch_web_pages, scrape_urls
+from html_store import HtmlStore, extract_texts
+from boilerplate import BoilerplateFilter
+from document_store import DocumentStore, write_document_store
+from file_parsers import PARSER_VERSION, parse_file_timed
 
 # Load environment variables
 load_dotenv("api_key.env")
@@ -51,16 +57,100 @@ if not GEMINI_API_KEY:
         "Get one at: https://makersuite.google.com/app/apikey"
     )
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash-latest')
+GEMINI_MODEL_NAME = 'gemini-1.5-flash-latest'
+gemini_model = None
+gemini_model_lock = threading.Lock()
+
+# Prompt tokens sent to Gemini and how many of them were served from its prompt cache
+prompt_usage = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+prompt_usage_lock = threading.Lock()
+
+def get_gemini_model():
+    """Configure the Gemini client on first use; importing google.generativeai takes a while."""
+    global gemini_model
+    if gemini_model is None:
+        with gemini_model_lock:
+            if gemini_model is None:
+                import google.generativeai as genai
+                from complete_gemini_prompt import GEMINI_SYSTEM_PROMPT
+                genai.configure(api_key=GEMINI_API_KEY)
+                # The static guidelines go in the system instruction; requests only carry context and question
+                gemini_model = genai.GenerativeModel(GEMINI_MODEL_NAME, system_instruction=GEMINI_SYSTEM_PROMPT)
+    return gemini_model
+
+def record_prompt_usage(response):
+    """Count the prompt tokens of one Gemini response and how many came from the prompt cache."""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return
+    with prompt_usage_lock:
+        prompt_usage["requests"] += 1
+        prompt_usage["prompt_tokens"] += usage.prompt_token_count
+        prompt_usage["cached_tokens"] += getattr(usage, "cached_content_token_count", 0) or 0
+
+def prompt_usage_stats() -> dict:
+    with prompt_usage_lock:
+        stats = dict(prompt_usage)
+    stats["cached_ratio"] = round(stats["cached_tokens"] / stats["prompt_tokens"], 4) if stats["prompt_tokens"] else 0.0
+    return stats
+
+# Structured ingestion: one document per question/answer object in the *_enhanced_json.txt files
+STRUCTURED_JSON_INGEST = os.getenv("WEWORK_STRUCTURED_JSON", "1") == "1"
+INGEST_SUFFIX = '_qa' if STRUCTURED_JSON_INGEST else ''
 
 # Cache paths - Updated for local environment
 CACHE_DIR = './cache'
 os.makedirs(CACHE_DIR, exist_ok=True)
-DOCS_CACHE = os.path.join(CACHE_DIR, 'documents.pkl')
-WEB_CACHE = os.path.join(CACHE_DIR, 'web_documents.pkl')
+DOCS_CACHE = os.path.join(CACHE_DIR, f'documents{INGEST_SUFFIX}')  # text blob + offsets + manifest, mmapped
+# Cached documents are discarded when the parser or ingest mode that produced them changes
+LOADER_VERSION = {"parser": PARSER_VERSION, "structured_json": STRUCTURED_JSON_INGEST}
+WEB_CACHE = os.path.join(CACHE_DIR, 'web_pages.json')  # url -> text, ETag, Last-Modified, content hash
+WEB_FETCH_STATS = os.path.join(CACHE_DIR, 'web_fetch_stats.json')
+WEB_HTML_STORE = os.path.join(CACHE_DIR, 'web_html')  # gzip raw HTML by sha256, plus url -> digest index
 SCRAPE_WEB = False  # Disabled for local testing
 
+# Local files are parsed on a process pool; a file taking longer than the timeout is skipped
+PARSE_WORKERS = int(os.getenv("WEWORK_PARSE_WORKERS", "0")) or os.cpu_count() or 1
+PARSE_TIMEOUT = float(os.getenv("WEWORK_PARSE_TIMEOUT", "120"))
+
+# Chunks embedded and upserted per batch when building or syncing the index; the manifest
+# is checkpointed after every batch so an interrupted build resumes where it stopped
+INGEST_BATCH_SIZE = int(os.getenv("WEWORK_INGEST_BATCH_SIZE", "256"))
+
+# The numpy backends rewrite their whole matrix on every persist, so they are persisted
+# (and the manifest checkpointed) only every N flushes and at the end of the sync
+NUMPY_PERSIST_EVERY = max(1, int(os.getenv("WEWORK_NUMPY_PERSIST_EVERY", "16")))
+
+# Index builds can shard chunk embedding over a sentence-transformers process pool (torch backend only)
+BUILD_EMBED_WORKERS = int(os.getenv("WEWORK_BUILD_EMBED_WORKERS", "0"))
+BUILD_EMBED_BATCH_SIZE = int(os.getenv("WEWORK_BUILD_EMBED_BATCH_SIZE", "64"))
+BUILD_TORCH_THREADS = int(os.getenv("WEWORK_BUILD_TORCH_THREADS", "0")) or None
+
+# Chunk embeddings persisted by (model, text hash) across builds, versions and models; empty disables
+CHUNK_EMBEDDING_CACHE = os.getenv("WEWORK_CHUNK_EMBEDDING_CACHE", os.path.join(CACHE_DIR, 'chunk_embeddings.sqlite'))
+
+# Playwright pool: browsers are reused across URLs, each page gets its own context
+SCRAPE_BROWSERS = int(os.getenv("WEWORK_SCRAPE_BROWSERS", "2"))
+SCRAPE_CONCURRENCY = int(os.getenv("WEWORK_SCRAPE_CONCURRENCY", "8"))
+SCRAPE_TIMEOUT_MS = int(os.getenv("WEWORK_SCRAPE_TIMEOUT_MS", "15000"))
+
+# Try a plain HTTP GET + lxml parse first; render in Playwright only when a page has too little text
+STATIC_FETCH = os.getenv("WEWORK_STATIC_FETCH", "1") == "1"
+STATIC_MIN_TEXT_CHARS = int(os.getenv("WEWORK_STATIC_MIN_TEXT_CHARS", "400"))
+
+# Processes used to re-extract text from stored raw HTML (defaults to one per core)
+EXTRACT_WORKERS = int(os.getenv("WEWORK_EXTRACT_WORKERS", "0")) or None
+
+# Lines found on at least this fraction of scraped pages (nav, footer, city menus) are stripped; 0 disables
+BOILERPLATE_MIN_FRACTION = float(os.getenv("WEWORK_BOILERPLATE_MIN_FRACTION", "0.3"))
+
+# Skip the vector searches when the query names a building or the top BM25 hit scores at
+# least this many times the runner-up; 0 always runs them
+LEXICAL_SHORTCUT_MARGIN = float(os.getenv("WEWORK_LEXICAL_SHORTCUT_MARGIN", "2.0"))
+
+# Vector store backend: "chroma", "numpy" (memory-mapped float32) or "numpy_int8"
+VECTOR_BACKEND = os.getenv("WEWORK_VECTOR_BACKEND", "chroma")
+
 # OPTIMIZED EMBEDDING MODELS FOR DIFFERENT USE CASES
 EMBEDDING_OPTIONS = {
     "qa_optimized": "sentence-transformers/multi-qa-mpnet-base-dot-v1",  # Best for Q&A
@@ -73,15 +163,49 @@ EMBEDDING_OPTIONS = {
 # Choose the best model for Q&A tasks
 SELECTED_MODEL = "general_fast"  # Using faster model to avoid torch.distributed issues
 
-print(f"🚀 Using embedding model: {EMBEDDING_OPTIONS[SELECTED_MODEL]}")
-print("Loading embedding model...")
-start_time = time.time()
-embedding_model = HuggingFaceEmbeddings(
-    model_name=EMBEDDING_OPTIONS[SELECTED_MODEL],
-    model_kwargs={'device': 'cpu'},  # Use 'cuda' if GPU available
-    encode_kwargs={'normalize_embeddings': True}  # Normalize for better similarity scores
+# Embedding inference backend: "torch", "onnx" or "onnx_int8" (exported to cache/onnx on first use)
+EMBEDDING_BACKEND = os.getenv("WEWORK_EMBEDDING_BACKEND", "torch")
+
+# Index specific to the vector backend, model, embedding backend and ingest mode (ONNX and
+# torch vectors differ slightly, so switching WEWORK_EMBEDDING_BACKEND builds a new index).
+# Each rebuild writes a new version (<base>_v<n>, with _manifest.json, _abbreviations.json and
+# _boilerplate.json beside it) and <base>_current.json points at the version being served.
+INDEX_BASE = os.path.join(CACHE_DIR, f'{VECTOR_BACKEND}_{SELECTED_MODEL}_{EMBEDDING_BACKEND}{INGEST_SUFFIX}')
+CURRENT_INDEX_FILE = INDEX_BASE + '_current.json'
+# flock()ed for the duration of a rebuild, so pre-fork workers never build concurrently
+REBUILD_LOCK_FILE = INDEX_BASE + '_rebuild.lock'
+
+def index_dir(version: int) -> str:
+    return f"{INDEX_BASE}_v{version}"
+
+def load_base_embeddings():
+    """Load the selected embedding model on the configured inference backend."""
+    if EMBEDDING_BACKEND in ("onnx", "onnx_int8"):
+        from onnx_embeddings import load_onnx_embeddings
+        return load_onnx_embeddings(EMBEDDING_OPTIONS[SELECTED_MODEL], CACHE_DIR,
+                                    quantized=EMBEDDING_BACKEND == "onnx_int8")
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_OPTIONS[SELECTED_MODEL],
+        model_kwargs={'device': 'cpu'},  # Use 'cuda' if GPU available
+        encode_kwargs={'normalize_embeddings': True}  # Normalize for better similarity scores
+    )
+
+print(f"🚀 Using embedding model: {EMBEDDING_OPTIONS[SELECTED_MODEL]} ({EMBEDDING_BACKEND})")
+# The encoder is loaded on first use (warm_up_rag_system loads it before serving);
+# query embeddings are memoised so rewritten and repeated queries skip it
+embedding_model = CachedQueryEmbeddings(
+    LazyEmbeddings(load_base_embeddings),
+    max_entries=int(os.getenv("WEWORK_QUERY_EMBEDDING_CACHE_SIZE", "2048"))
 )
-print(f"Model loaded in {time.time() - start_time:.2f} seconds")
+
+# Representative queries retrieved during warm-up, before the API reports ready ("|"-separated)
+WARMUP_QUERIES = [query.strip() for query in os.getenv(
+    "WEWORK_WARMUP_QUERIES", "What is a private office?|How much does All Access cost?|What does PO stand for?"
+).split("|") if query.strip()]
+
+# Startup phase -> seconds, reported by /status
+startup_timings = {}
 
 def extract_potential_abbreviations(query: str) -> list:
     """Extract potential abbreviations from query."""
@@ -90,6 +214,43 @@ def extract_potential_abbreviations(query: str) -> list:
     found_abbrevs = [abbrev for abbrev in potential_abbrevs if abbrev in known_abbreviations]
     return found_abbrevs
 
+def _search_by_vectors(vectorstore, query_embeddings: list, k: int) -> list:
+    """Run one Chroma similarity search per embedding in a single vectorised query."""
+    results = vectorstore._collection.query(
+        query_embeddings=query_embeddings,
+        n_results=k,
+        include=["documents", "metadatas"],
+    )
+    return [
+        [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+        for texts, metadatas in zip(results["documents"], results["metadatas"])
+    ]
+
+def batch_retrieve(retriever, queries: list, k: int = None) -> list:
+    """Retrieve chunks for several queries with one encoder call and one vector search.
+
+    Returns one list of chunks per query, in the same order as ``queries``.
+    Falls back to one ``retriever.invoke`` per query for retrievers that are
+    not backed by a Chroma or NumPy vectorstore.
+    """
+    if not queries:
+        return []
+
+    vectorstore = getattr(retriever, "vectorstore", None)
+    batched = hasattr(vectorstore, "similarity_search_by_vectors") or hasattr(vectorstore, "_collection")
+    if not batched:
+        return [retriever.invoke(query) for query in queries]
+
+    k = k or retriever.search_kwargs.get("k", 4)
+    embeddings = vectorstore.embeddings
+    if hasattr(embeddings, "embed_queries"):
+        query_embeddings = embeddings.embed_queries(list(queries))
+    else:
+        query_embeddings = embeddings.embed_documents(list(queries))
+    if hasattr(vectorstore, "similarity_search_by_vectors"):
+        return vectorstore.similarity_search_by_vectors(query_embeddings, k)
+    return _search_by_vectors(vectorstore, query_embeddings, k)
+
 def search_for_abbreviation_definitions(retriever, abbreviations: list):
     """Search for abbreviation definitions with optimized queries."""
     print(f"🔍 Step 1: Searching for abbreviation definitions for: {abbreviations}")
@@ -105,8 +266,8 @@ def search_for_abbreviation_definitions(retriever, abbreviations: list):
         f"{' '.join(abbreviations)} abbreviation definition"
     ]
     
-    for query in abbrev_queries:
-        chunks = retriever.invoke(query)
+    # All definition queries share one encoder call and one vector search
+    for chunks in batch_retrieve(retriever, abbrev_queries):
         abbreviation_chunks.extend(chunks)
     
     # Remove duplicates
@@ -160,25 +321,187 @@ def extract_abbreviation_mappings(abbreviation_chunks: list, target_abbrevs: lis
     print(f"   Extracted mappings: {mappings}")
     return mappings
 
-def expand_query_with_mappings(original_query: str, mappings: dict) -> str:
-    """Expand query with better context preservation."""
-    expanded_query = original_query
-    
+ABBREVIATION_LIST_HEADER = 'list of wework product abbreviations'
+# Bumped when build_abbreviation_index changes, so persisted indexes are rebuilt
+ABBREVIATION_INDEX_FORMAT = 2
+
+def build_abbreviation_index(documents: list) -> dict:
+    """Build an abbreviation -> product name index from the knowledge base abbreviation lists.
+
+    Parses the "List of WeWork product abbreviations" sections, whose lines look like
+    ``Private Office -  PO, WeWork PO, WeWork Private Office, po``.
+    """
+    index = {}
+    derived = {}  # first word -> product names of the aliases starting with it
+    line_pattern = re.compile(r'^(.+?)\s+-\s*(.*)$')
+
+    for doc in documents:
+        lines = doc.page_content.splitlines()
+        for i, line in enumerate(lines):
+            if not line.strip().lower().endswith(ABBREVIATION_LIST_HEADER):
+                continue
+            for entry in lines[i + 1:]:
+                entry = re.sub(r'^answer:\s*', '', entry.strip(), flags=re.IGNORECASE)
+                if not entry:
+                    continue
+                match = line_pattern.match(entry)
+                if not match:
+                    break
+                if re.search(r'\s-[\s,]', match.group(2)):
+                    continue  # Flattened copy of the whole list on one line
+                full_form = match.group(1).strip()
+                for alias in re.split(r',|\bor\b', match.group(2)):
+                    alias = alias.strip().lower()
+                    if not alias or alias == full_form.lower():
+                        continue
+                    index.setdefault(alias, full_form)
+                    first_word = alias.split()[0]
+                    if first_word != alias and re.fullmatch(r'[a-z]{1,4}', first_word):
+                        derived.setdefault(first_word, set()).add(full_form)
+
+    # "aa plus" also makes the bare "aa" resolve to All Access Plus, but only when every
+    # alias starting with that word names the same product and the word is the initials of
+    # the product's leading words ("ww labs" does not make "ww" WeWork Labs)
+    for abbrev, full_forms in derived.items():
+        if len(full_forms) != 1:
+            continue
+        full_form = next(iter(full_forms))
+        if ''.join(word[0] for word in full_form.lower().split()).startswith(abbrev):
+            index.setdefault(abbrev, full_form)
+    return index
+
+# Property list lines: "3. Express Towers ( https://www.wework.com/buildings/express-towers--mumbai )"
+BUILDING_LINE = re.compile(r'^\s*\d+\.\s+(.+?)\s*\(\s*(https?://\S*wework\S*?)\s*\)\s*$', re.IGNORECASE)
+CITY_HEADER = re.compile(r'\bproperties in ([a-z][a-z ]*?)\s*$', re.IGNORECASE)
+URL_CITY = re.compile(r'--([a-z-]+)/?$|wework\.co\.in/([a-z-]+)/')
+
+def build_entity_table(documents: list, abbreviations: dict) -> dict:
+    """Phrase table of the products, cities and buildings named in the knowledge base.
+
+    Maps tokenize() tuples to (kind, name): products from the abbreviation index
+    (aliases and full forms), cities and buildings from the property lists. Queries
+    that name different entities must not share cached answers (see describe_query).
+    """
+    table = {}
+
+    def add(phrase: str, kind: str, name: str):
+        key = tuple(tokenize(phrase))
+        if key:
+            table.setdefault(key, (kind, name))
+
+    for alias, full_form in abbreviations.items():
+        add(alias, "product", full_form)
+        add(full_form, "product", full_form)
+    for doc in documents:
+        for line in doc.page_content.splitlines():
+            header = CITY_HEADER.search(line)
+            if header:
+                add(header.group(1), "city", header.group(1).strip().title())
+            building = BUILDING_LINE.match(line)
+            if building:
+                add(building.group(1), "building", building.group(1).strip())
+                city = URL_CITY.search(building.group(2))
+                if city:
+                    name = (city.group(1) or city.group(2)).replace('-', ' ')
+                    add(name, "city", name.title())
+    return table
+
+def load_abbreviation_index(documents: list, path: str, rebuild: bool = False) -> dict:
+    """Load the persisted abbreviation index, building it from the documents on first use."""
+    if os.path.exists(path) and not rebuild:
+        with open(path, 'r') as f:
+            persisted = json.load(f)
+        if persisted.get("format") == ABBREVIATION_INDEX_FORMAT:
+            index = persisted["abbreviations"]
+            print(f"Loaded {len(index)} abbreviations from cache")
+            return index
+        if not documents:
+            print(f"⚠️  Abbreviation index {path} predates format {ABBREVIATION_INDEX_FORMAT}; rebuild to refresh it")
+            return persisted
+
+    index = build_abbreviation_index(documents)
+    with open(path, 'w') as f:
+        json.dump({"format": ABBREVIATION_INDEX_FORMAT, "abbreviations": index}, f, indent=2, sort_keys=True)
+    print(f"Built abbreviation index with {len(index)} entries")
+    return index
+
+def abbreviation_definition_chunk(mappings: dict) -> Document:
+    """Context chunk stating what the query's abbreviations stand for, e.g. "po = Private Office"."""
+    lines = "\n".join(f"{abbrev} = {full_form}" for abbrev, full_form in mappings.items())
+    return Document(page_content=f"WeWork product abbreviations in the question:\n{lines}",
+                    metadata={"source": "abbreviation index"})
+
+def lookup_abbreviations(abbreviations: list, index: dict) -> dict:
+    """Resolve abbreviations against the ingest-time abbreviation index."""
+    mappings = {abbrev: index[abbrev] for abbrev in abbreviations if abbrev in index}
+    print(f"🔍 Steps 1-3: Abbreviation index lookup: {mappings}")
+    return mappings
+
+def expand_abbreviations(query: str, mappings: dict) -> str:
     for abbrev, full_form in mappings.items():
         # Replace abbreviation but also add full form for better retrieval
         pattern = r'\b' + abbrev + r'\b'
         replacement = f"{abbrev} {full_form}"  # Keep both for better matching
-        expanded_query = re.sub(pattern, replacement, expanded_query, flags=re.IGNORECASE)
+        query = re.sub(pattern, replacement, query, flags=re.IGNORECASE)
+    return query
+
+def expand_query_with_mappings(original_query: str, mappings: dict) -> str:
+    """Expand query with better context preservation."""
+    expanded_query = expand_abbreviations(original_query, mappings)
     
     print(f"🔍 Step 3: Expanded query: '{original_query}' → '{expanded_query}'")
     return expanded_query
 
-def multi_step_retrieve(retriever, query: str, k: int = 8):
-    """Optimized multi-step retrieval process."""
+def describe_query(query: str, index: dict = None) -> tuple:
+    """(abbreviation-expanded query, sorted (kind, name) entities it names), from ingest-time tables only.
+
+    Cheap enough to run before the answer cache lookup: "aa" and "aa plus", or the
+    same question about Pune and Mumbai, differ in their entities.
+    """
+    abbreviations_by_alias = index["abbreviations"] if index else abbreviation_index
+    entities = index["entities"] if index else entity_table
+    mappings = {abbrev: abbreviations_by_alias[abbrev] for abbrev in extract_potential_abbreviations(query)
+                if abbrev in abbreviations_by_alias}
+    return expand_abbreviations(query, mappings), sorted(set(find_phrases(query, entities)))
+
+def is_abbreviation_definition(chunk) -> bool:
+    content = chunk.page_content.lower()
+    return 'abbreviation' in content or 'private office -' in content
+
+def lexical_shortcut(lexical_hits: list, query: str, entities: dict) -> str:
+    """Why the BM25 hits alone are good enough for this query, or None to run the vector searches too."""
+    if not LEXICAL_SHORTCUT_MARGIN or not lexical_hits:
+        return None
+    buildings = [name for kind, name in find_phrases(query, entities) if kind == "building"]
+    if buildings:
+        return f"names {', '.join(buildings)}"
+    if len(lexical_hits) == 1 or lexical_hits[0][1] >= LEXICAL_SHORTCUT_MARGIN * lexical_hits[1][1]:
+        return f"top BM25 score {lexical_hits[0][1]:.2f} clears the margin"
+    return None
+
+def fuse_rankings(ranked_lists: list) -> list:
+    """Reciprocal rank fusion, with abbreviation definitions ranked once more so they stay near the top."""
+    candidates = {chunk.page_content: chunk for ranking in ranked_lists for chunk in ranking}
+    definitions = [chunk for chunk in candidates.values() if is_abbreviation_definition(chunk)]
+    return reciprocal_rank_fusion(ranked_lists + [definitions])
+
+def multi_step_retrieve(retriever, query: str, k: int = 8, index: dict = None):
+    """Optimized multi-step retrieval process.
+
+    ``index`` is a snapshot from get_active_index(); passing it keeps the whole
+    request on one index version even if a rebuild swaps in a new one meanwhile.
+    With a lexical index, a confident BM25 match (see lexical_shortcut) is
+    returned without embedding the query.
+    """
     print(f"\n🚀 MULTI-STEP RETRIEVAL for: '{query}'")
     print("="*60)
     
+    abbreviations_by_alias = index["abbreviations"] if index else abbreviation_index
+    entities = index["entities"] if index else entity_table
+    lexical = index["lexical"] if index else lexical_index
     all_chunks = []
+    mappings = {}
+    lexical_query = query
     
     # Step 1: Extract potential abbreviations
     abbreviations = extract_potential_abbreviations(query)
@@ -186,38 +509,63 @@ def multi_step_retrieve(retriever, query: str, k: int = 8):
     if abbreviations:
         print(f"✓ Found potential abbreviations: {abbreviations}")
         
-        # Step 2: Search for abbreviation definitions with higher k for better coverage
-        abbrev_chunks = search_for_abbreviation_definitions(retriever, abbreviations)
-        
-        # Add best abbreviation chunks
-        best_abbrev_chunks = sorted(abbrev_chunks, 
-                                   key=lambda x: x.page_content.lower().count('abbreviation') + 
-                                               x.page_content.lower().count('private office'))[:3]
-        all_chunks.extend(best_abbrev_chunks)
-        
-        # Step 3: Extract mappings
-        mappings = extract_abbreviation_mappings(abbrev_chunks, abbreviations)
+        if abbreviations_by_alias:
+            # Steps 2-3 are answered by the abbreviation index built at ingest time
+            mappings = lookup_abbreviations(abbreviations, abbreviations_by_alias)
+            if mappings:
+                # The definition chunks are not retrieved on this path, so give the LLM the mappings
+                all_chunks.append(abbreviation_definition_chunk(mappings))
+        else:
+            # Step 2: Search for abbreviation definitions with higher k for better coverage
+            abbrev_chunks = search_for_abbreviation_definitions(retriever, abbreviations)
+            
+            # Add best abbreviation chunks
+            best_abbrev_chunks = sorted(abbrev_chunks, 
+                                       key=lambda x: x.page_content.lower().count('abbreviation') + 
+                                                   x.page_content.lower().count('private office'))[:3]
+            all_chunks.extend(best_abbrev_chunks)
+            
+            # Step 3: Extract mappings
+            mappings = extract_abbreviation_mappings(abbrev_chunks, abbreviations)
         
         if mappings:
-            # Step 4: Search with expanded query
-            expanded_query = expand_query_with_mappings(query, mappings)
-            expanded_chunks = retriever.invoke(expanded_query)
-            all_chunks.extend(expanded_chunks[:4])
-            
-            # Step 5: Also search with just the full forms for more coverage
-            for abbrev, full_form in mappings.items():
-                full_form_query = query.replace(abbrev, full_form)
-                if full_form_query != expanded_query:  # Avoid duplicates
-                    additional_chunks = retriever.invoke(full_form_query)
-                    all_chunks.extend(additional_chunks[:2])
+            lexical_query = expand_query_with_mappings(query, mappings)
         else:
             print("⚠️  No abbreviation mappings found, using original query")
-            original_chunks = retriever.invoke(query)
-            all_chunks.extend(original_chunks[:4])
     else:
         print("ℹ️  No abbreviations detected, using standard retrieval")
+    
+    lexical_hits = lexical.search(lexical_query, k) if lexical is not None else []
+    lexical_chunks = [chunk for chunk, _ in lexical_hits]
+    if lexical is not None:
+        print(f"🔍 Lexical (BM25) matches: {len(lexical_chunks)}")
+        reason = lexical_shortcut(lexical_hits, lexical_query, entities)
+        if reason:
+            print(f"⚡ Lexical match is confident ({reason}), skipping vector search")
+            final_chunks = fuse_rankings([all_chunks, lexical_chunks])[:k]
+            print(f"🎯 Final result: {len(final_chunks)} unique chunks")
+            print("="*60)
+            return final_chunks
+    
+    if mappings:
+        # Step 4: Search with expanded query
+        expanded_query = lexical_query
+        
+        # Step 5: Also search with just the full forms for more coverage
+        full_form_queries = []
+        for abbrev, full_form in mappings.items():
+            full_form_query = query.replace(abbrev, full_form)
+            if full_form_query != expanded_query and full_form_query not in full_form_queries:  # Avoid duplicates
+                full_form_queries.append(full_form_query)
+        
+        # Steps 4 and 5 run as a single batched retrieval
+        expanded_chunks, *additional_results = batch_retrieve(retriever, [expanded_query] + full_form_queries)
+        all_chunks.extend(expanded_chunks[:4])
+        for additional_chunks in additional_results:
+            all_chunks.extend(additional_chunks[:2])
+    else:
         original_chunks = retriever.invoke(query)
-        all_chunks.extend(original_chunks[:k])
+        all_chunks.extend(original_chunks[:4] if abbreviations else original_chunks[:k])
     
     # Step 6: Smart deduplication and ranking
     seen_content = set()
@@ -229,17 +577,21 @@ def multi_step_retrieve(retriever, query: str, k: int = 8):
             seen_content.add(content_hash)
             unique_chunks.append(chunk)
     
-    # Rank chunks by relevance to query
-    def relevance_score(chunk, query_words):
-        content = chunk.page_content.lower()
-        score = sum(1 for word in query_words if word in content)
-        # Bonus for abbreviation definitions
-        if 'abbreviation' in content or 'private office -' in content:
-            score += 2
-        return score
-    
-    query_words = query.lower().split()
-    unique_chunks.sort(key=lambda x: relevance_score(x, query_words), reverse=True)
+    if lexical is not None:
+        # Fuse the vector ranking with the BM25 lookup over the whole index
+        unique_chunks = fuse_rankings([unique_chunks, lexical_chunks])
+    else:
+        # Rank chunks by relevance to query
+        def relevance_score(chunk, query_words):
+            content = chunk.page_content.lower()
+            score = sum(1 for word in query_words if word in content)
+            # Bonus for abbreviation definitions
+            if is_abbreviation_definition(chunk):
+                score += 2
+            return score
+        
+        query_words = query.lower().split()
+        unique_chunks.sort(key=lambda x: relevance_score(x, query_words), reverse=True)
     
     final_chunks = unique_chunks[:k]
     print(f"🎯 Final result: {len(final_chunks)} unique chunks")
@@ -247,103 +599,301 @@ def multi_step_retrieve(retriever, query: str, k: int = 8):
     
     return final_chunks
 
-def generate_answer_with_gemini(question: str, context_chunks: list) -> str:
-    """Generate answer with complete Gemini-optimized WeWork prompt including all original features."""
+def build_gemini_prompt(question: str, context_chunks: list) -> str:
+    """Per-request part of the Gemini-optimized WeWork prompt; the guidelines are the model's system instruction."""
     from complete_gemini_prompt import get_complete_gemini_prompt
     
     chunks_retrieved = "\n\n".join([f"Chunk {i+1}:\n{chunk.page_content}" 
                                    for i, chunk in enumerate(context_chunks)])
     
-    prompt = get_complete_gemini_prompt(question, chunks_retrieved)
+    return get_complete_gemini_prompt(question, chunks_retrieved)
+
+def generate_answer_with_gemini(question: str, context_chunks: list) -> str:
+    """Generate answer with complete Gemini-optimized WeWork prompt including all original features."""
+    prompt = build_gemini_prompt(question, context_chunks)
 
     try:
-        response = model.generate_content(prompt)
+        response = get_gemini_model().generate_content(prompt)
+        record_prompt_usage(response)
         return response.text.strip()
     except Exception as e:
         return f"Error generating answer: {str(e)}"
 
+async def generate_answer_with_gemini_async(question: str, context_chunks: list) -> str:
+    """Async generate_answer_with_gemini for the ASGI API; the event loop is free while Gemini responds."""
+    prompt = build_gemini_prompt(question, context_chunks)
+
+    try:
+        response = await get_gemini_model().generate_content_async(prompt)
+        record_prompt_usage(response)
+        return response.text.strip()
+    except Exception as e:
+        return f"Error generating answer: {str(e)}"
+
+def stream_answer_with_gemini(question: str, context_chunks: list):
+    """generate_answer_with_gemini, yielding the answer text as Gemini produces it."""
+    prompt = build_gemini_prompt(question, context_chunks)
+    chunk = None
+    for chunk in get_gemini_model().generate_content(prompt, stream=True):
+        # A chunk without parts (e.g. only a finish reason) has no text
+        if chunk.parts:
+            yield chunk.text
+    # The last chunk carries the usage for the whole response
+    record_prompt_usage(chunk)
+
+async def stream_answer_with_gemini_async(question: str, context_chunks: list):
+    """Async stream_answer_with_gemini for the ASGI API."""
+    prompt = build_gemini_prompt(question, context_chunks)
+    chunk = None
+    async for chunk in await get_gemini_model().generate_content_async(prompt, stream=True):
+        if chunk.parts:
+            yield chunk.text
+    record_prompt_usage(chunk)
+
+# Bump when split_documents changes, so every source is re-split on the next sync (chunks
+# whose text is unchanged keep their IDs and are not embedded again)
+CHUNKER_VERSION = 2
+
+chunk_tokenizer = None
+
+def load_chunk_tokenizer() -> tuple:
+    """(tokenizer, max_seq_length) of the selected embedding model; text past max_seq_length is truncated."""
+    global chunk_tokenizer
+    if chunk_tokenizer is None:
+        from huggingface_hub import hf_hub_download
+        from transformers import AutoTokenizer
+        model_name = EMBEDDING_OPTIONS[SELECTED_MODEL]
+        with open(hf_hub_download(model_name, 'sentence_bert_config.json'), 'r') as f:
+            max_seq_length = json.load(f)["max_seq_length"]
+        chunk_tokenizer = (AutoTokenizer.from_pretrained(model_name), max_seq_length)
+    return chunk_tokenizer
+
+def split_qa_pair(doc, tokenizer, max_tokens: int) -> list:
+    """Split a question/answer pair the encoder would truncate into parts that each repeat the question."""
+    # [CLS] and [SEP] count against max_seq_length too
+    if len(tokenizer.tokenize(doc.page_content)) + 2 <= max_tokens or "\nAnswer: " not in doc.page_content:
+        return [doc]
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    question, answer = doc.page_content.split("\nAnswer: ", 1)
+    budget = max_tokens - len(tokenizer.tokenize(f"{question}\nAnswer: ")) - 2
+    if budget < max_tokens // 4:
+        return [doc]  # The question alone nearly fills the window
+    answer_splitter = RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+        tokenizer, chunk_size=budget, chunk_overlap=budget // 8)
+    parts = answer_splitter.split_text(answer)
+    return [Document(page_content=f"{question}\nAnswer: {part}",
+                     metadata=dict(doc.metadata, qa_part=i + 1, qa_parts=len(parts)))
+            for i, part in enumerate(parts)]
+
+def split_documents(documents: list) -> list:
+    """Split documents into chunks, keeping question/answer pairs whole and in order.
+
+    Pairs longer than the embedding model's max_seq_length are the exception: they are
+    split into parts that each repeat the question, instead of losing their tail.
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=200)
+    chunks = []
+    for doc in documents:
+        if doc.metadata.get('qa_pair'):
+            chunks.extend(split_qa_pair(doc, *load_chunk_tokenizer()))
+        else:
+            chunks.extend(text_splitter.split_documents([doc]))
+    return chunks
+
+def file_content_hash(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
 def load_local_files():
-    """Load local files from WeWork data directory."""
+    """Load local files from WeWork data directory.
+
+    Parsed documents are kept in a memory-mapped document store together with each
+    file's size, mtime and content hash, so only new or changed files are parsed
+    again (files whose size and mtime are unchanged are not even re-hashed). Those
+    are parsed in parallel on a process pool; documents are returned in sorted file
+    order regardless.
+    """
     print("Loading local files...")
     start_time = time.time()
 
-    if os.path.exists(DOCS_CACHE):
-        with open(DOCS_CACHE, 'rb') as f:
-            pages = pickle.load(f)
-        print(f"Loaded {len(pages)} documents from cache in {time.time() - start_time:.2f} seconds")
-        return pages
-
     # Prefer shared data directory (overridable via WEWORK_DATA_DIR)
     UPLOAD_FOLDER = DATA_BASE
-    pages = []
 
     if not os.path.exists(UPLOAD_FOLDER):
         print(f"Warning: data folder not found at {UPLOAD_FOLDER}. Returning empty document list.")
         return []
 
-    for file in tqdm(os.listdir(UPLOAD_FOLDER), desc="Processing local files"):
-        file_path = os.path.join(UPLOAD_FOLDER, file)
-        try:
-            if file.endswith('.pdf'):
-                # Use PyPDF2 for PDF files
-                with open(file_path, 'rb') as pdf_file:
-                    pdf_reader = PyPDF2.PdfReader(pdf_file)
-                    text = ""
-                    for page in pdf_reader.pages:
-                        text += page.extract_text()
-                    pages.append(Document(page_content=text, metadata={"source": file_path}))
-            elif file.endswith('.docx') or file.endswith('.doc'):
-                # Use docx2txt for Word documents
-                text = docx2txt.process(file_path)
-                pages.append(Document(page_content=text, metadata={"source": file_path}))
-            elif file.endswith('.txt'):
-                # Use TextLoader for text files
-                loader = TextLoader(file_path)
-                pages.extend(loader.load())
-            elif file.endswith('.json'):
-                # Handle JSON files manually
-                with open(file_path, 'r') as json_file:
-                    data = json.load(json_file)
-                    text = json.dumps(data, indent=2)
-                    pages.append(Document(page_content=text, metadata={"source": file_path}))
-        except Exception as e:
-            print(f"Error loading {file}: {e}")
-
-    with open(DOCS_CACHE, 'wb') as f:
-        pickle.dump(pages, f)
-
-    print(f"Processed {len(pages)} documents in {time.time() - start_time:.2f} seconds")
+    legacy_cache = DOCS_CACHE + '.pkl'
+    if os.path.exists(legacy_cache):
+        os.remove(legacy_cache)  # Pickled cache from before the document store
+    store = DocumentStore(DOCS_CACHE, LOADER_VERSION)
+
+    file_paths = [os.path.join(UPLOAD_FOLDER, file) for file in sorted(os.listdir(UPLOAD_FOLDER))]
+    stats = {path: os.stat(path) for path in file_paths if os.path.isfile(path)}
+    hashes = {path: store.cached_hash(path, stat) or file_content_hash(path) for path, stat in stats.items()}
+    to_parse = [path for path, digest in hashes.items()
+                if not (path in store.sources and store.sources[path]["hash"] == digest)]
+
+    results = {}
+    jobs = [(path, STRUCTURED_JSON_INGEST, PARSE_TIMEOUT) for path in to_parse]
+    if len(jobs) > 1 and PARSE_WORKERS > 1:
+        with ProcessPoolExecutor(max_workers=min(PARSE_WORKERS, len(jobs))) as executor:
+            # Submit the biggest files first so they do not end up as the tail of the run
+            futures = {job[0]: executor.submit(parse_file_timed, job)
+                       for job in sorted(jobs, key=lambda job: -os.path.getsize(job[0]))}
+            for path, future in tqdm(futures.items(), desc="Parsing local files"):
+                results[path] = future.result()
+    else:
+        for job in jobs:
+            results[job[0]] = parse_file_timed(job)
+
+    pages = []
+    entries = {}
+    parsed = 0
+    timings = []
+    for path, digest in hashes.items():
+        if path in results:
+            docs, seconds, error = results[path]
+            timings.append((seconds, os.path.basename(path)))
+            if error:
+                print(f"Error loading {os.path.basename(path)}: {error}")
+                if path not in store.sources:
+                    continue
+                # Keep serving the previously parsed documents; the old fingerprint makes the
+                # file be parsed again on the next load
+                previous = store.sources[path]
+                entries[path] = {"hash": previous["hash"], "docs": store.documents(path),
+                                 "parse_seconds": previous["parse_seconds"],
+                                 "size": previous["size"], "mtime_ns": previous["mtime_ns"]}
+                pages.extend(entries[path]["docs"])
+                continue
+            parsed += 1
+            entries[path] = {"hash": digest, "docs": docs, "parse_seconds": round(seconds, 3)}
+        else:
+            entries[path] = {"hash": digest, "docs": store.documents(path),
+                             "parse_seconds": store.sources[path]["parse_seconds"]}
+        entries[path].update(size=stats[path].st_size, mtime_ns=stats[path].st_mtime_ns)
+        pages.extend(entries[path]["docs"])
+
+    for seconds, file in sorted(timings, reverse=True)[:5]:
+        print(f"  parsed {file} in {seconds:.2f}s")
+
+    # Also rewritten when only mtimes moved, so those files are not re-hashed next time
+    fingerprints_changed = any(store.cached_hash(path, stats[path]) is None for path in entries)
+    store.close()
+    if parsed or fingerprints_changed or entries.keys() != store.sources.keys():
+        write_document_store(DOCS_CACHE, LOADER_VERSION, entries)
+
+    print(f"Loaded {len(pages)} documents ({parsed} files parsed, {len(entries) - parsed} from cache) "
+          f"in {time.time() - start_time:.2f} seconds")
     return pages
 
+def fetch_rendered_pages(urls: list) -> tuple:
+    """Render URLs with the pooled Playwright scraper. Returns ({url: html}, {url: stats})."""
+    return scrape_urls(urls, browsers=SCRAPE_BROWSERS, concurrency=SCRAPE_CONCURRENCY, timeout_ms=SCRAPE_TIMEOUT_MS)
+
 def fetch_rendered_html(url):
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        try:
-            page = browser.new_page()
-            try:
-                page.goto(url, timeout=15000)
-                page.wait_for_load_state('domcontentloaded', timeout=15000)
-                return page.content()
-            except Exception as e:
-                print(f"Error loading page for {url}: {e}")
-                return None
-            finally:
-                page.close()
-        except Exception as e:
-            print(f"Browser error for {url}: {e}")
-            return None
-        finally:
-            browser.close()
+    return fetch_rendered_pages([url])[0].get(url)
 
-def load_url_with_playwright(url: str) -> list[Document]:
-    html = fetch_rendered_html(url)
-    if html is None:
+def text_to_documents(url: str, text: str) -> list:
+    if not text:
         return []
-    soup = BeautifulSoup(html, "html.parser")
-    text = soup.get_text(separator="\n", strip=True)
     return [Document(page_content=text, metadata={"source": url})]
 
-def load_web_documents():
+def html_to_documents(url: str, html: str) -> list:
+    return text_to_documents(url, extract_visible_text(html) if html is not None else None)
+
+def load_url_with_playwright(url: str) -> list[Document]:
+    return html_to_documents(url, fetch_rendered_html(url))
+
+def save_web_fetch_stats(url_stats: dict):
+    """Write per-URL fetch path and timings to WEB_FETCH_STATS and print a summary."""
+    with open(WEB_FETCH_STATS, 'w') as f:
+        json.dump(url_stats, f, indent=2)
+
+    paths = Counter(stats["path"] for stats in url_stats.values())
+    for path in ("static", "browser", "not_modified", "failed"):
+        seconds = sorted(stats["seconds"] for stats in url_stats.values() if stats["path"] == path)
+        if seconds:
+            print(f"  {path:<12} {len(seconds):>4} URLs, median {seconds[len(seconds) // 2]:.2f}s, total {sum(seconds):.1f}s")
+    changes = Counter(stats["change"] for stats in url_stats.values())
+    print(f"Fetch paths: {dict(paths)}, changes: {dict(changes)} (per-URL stats in {WEB_FETCH_STATS})")
+
+def load_web_pages() -> dict:
+    """Per-URL page entries (text plus ETag / Last-Modified / content hash) from WEB_CACHE."""
+    if not os.path.exists(WEB_CACHE):
+        return {}
+    with open(WEB_CACHE, 'r') as f:
+        return json.load(f)
+
+def save_web_pages(pages: dict):
+    tmp_path = WEB_CACHE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(pages, f)
+    os.replace(tmp_path, WEB_CACHE)
+
+def reextract_web_pages(pages: dict, html_store: HtmlStore, urls: list = None) -> int:
+    """Re-derive page text from the stored raw HTML, in parallel, without fetching.
+
+    Defaults to pages extracted by an older EXTRACTOR_VERSION. Returns how many pages
+    were re-extracted.
+    """
+    if urls is None:
+        urls = [url for url, page in pages.items() if page.get("extractor") != EXTRACTOR_VERSION]
+    if not urls:
+        return 0
+
+    start_time = time.time()
+    texts = extract_texts(html_store, urls, extract_visible_text, workers=EXTRACT_WORKERS)
+    for url, text in texts.items():
+        pages[url].update(text=text, content_hash=content_hash(text), extractor=EXTRACTOR_VERSION)
+    missing = len(urls) - len(texts)
+    print(f"Re-extracted {len(texts)} web pages from stored HTML in {time.time() - start_time:.2f} seconds"
+          + (f" ({missing} have no stored HTML or failed to extract and keep their text until the next refresh)"
+             if missing else ""))
+    return len(texts)
+
+def web_pages_to_documents(pages: dict, boilerplate_path: str = None, refit: bool = False) -> list:
+    """One Document per page, with lines repeated across the scraped site stripped.
+
+    The repeated lines are learned once and kept at ``boilerplate_path``; later calls
+    reuse them unless ``refit`` is set, so a changed page only changes its own chunks.
+    """
+    raw_docs = [doc for url, page in pages.items() for doc in text_to_documents(url, page["text"])]
+    if BOILERPLATE_MIN_FRACTION <= 0:
+        return raw_docs
+
+    boilerplate = BoilerplateFilter.load(boilerplate_path) if boilerplate_path and not refit else None
+    if boilerplate is not None and boilerplate.min_fraction == BOILERPLATE_MIN_FRACTION:
+        print(f"Reusing {len(boilerplate)} boilerplate lines learned from {boilerplate.pages} pages")
+    else:
+        boilerplate = BoilerplateFilter(min_fraction=BOILERPLATE_MIN_FRACTION).fit(page["text"] for page in pages.values())
+        if boilerplate_path:
+            boilerplate.save(boilerplate_path)
+    web_docs = [doc for url, page in pages.items() for doc in text_to_documents(url, boilerplate.strip(page["text"]))]
+
+    raw_chunks, chunks = len(split_documents(raw_docs)), len(split_documents(web_docs))
+    raw_chars = sum(len(doc.page_content) for doc in raw_docs)
+    kept_chars = sum(len(doc.page_content) for doc in web_docs)
+    print(f"Boilerplate: {len(boilerplate)} repeated lines stripped from {boilerplate.pages} pages, "
+          f"{raw_chars - kept_chars} of {raw_chars} chars removed, chunks {raw_chunks} -> {chunks} "
+          f"({raw_chunks - chunks} saved)")
+    return web_docs
+
+def load_web_documents(refresh: bool = False, reextract: bool = False, boilerplate_path: str = None):
+    """Load scraped web pages, scraping on first use.
+
+    With ``refresh`` every URL is re-checked with a conditional request; only pages
+    that actually changed get new text (and so new chunks and embeddings downstream).
+    Pages whose text came from an older extractor, or every page with ``reextract``,
+    are re-extracted from the stored raw HTML instead of being fetched again.
+    Boilerplate lines are stripped with the set saved at ``boilerplate_path``, which is
+    learned again only when missing or with ``reextract``.
+    """
     print("Loading web documents...")
     start_time = time.time()
 
@@ -351,9 +901,12 @@ def load_web_documents():
         print("Web scraping disabled. Skipping...")
         return []
 
-    if os.path.exists(WEB_CACHE):
-        with open(WEB_CACHE, 'rb') as f:
-            web_docs = pickle.load(f)
+    pages = load_web_pages()
+    html_store = HtmlStore(WEB_HTML_STORE)
+    if pages and not refresh:
+        if reextract_web_pages(pages, html_store, urls=list(pages) if reextract else None):
+            save_web_pages(pages)
+        web_docs = web_pages_to_documents(pages, boilerplate_path, refit=reextract)
         print(f"Loaded {len(web_docs)} web documents from cache in {time.time() - start_time:.2f} seconds")
         return web_docs
 
@@ -366,84 +919,554 @@ def load_web_documents():
     with open(URL_FILE, 'r') as f:
         web_urls = f.read().splitlines()
 
-    print(f"Scraping {len(web_urls)} URLs...")
+    web_urls = list(dict.fromkeys(url.strip() for url in web_urls if url.strip()))
+    print(f"{'Refreshing' if pages else 'Scraping'} {len(web_urls)} URLs "
+          f"({'static-first' if STATIC_FETCH else 'browser only'}, "
+          f"{SCRAPE_BROWSERS} browsers x {SCRAPE_CONCURRENCY} pages for rendering)...")
 
-    def fetch_and_process_url(url):
-        try:
-            return load_url_with_playwright(url)
-        except Exception as e:
-            print(f"Failed to load {url}: {e}")
-            return []
-
-    web_docs = []
-    with ThreadPoolExecutor(max_workers=12) as executor:
-        futures = list(tqdm(executor.map(fetch_and_process_url, web_urls), total=len(web_urls), desc="Scraping websites"))
-        for docs in futures:
-            web_docs.extend(docs)
+    entries, url_stats = fetch_web_pages(
+        web_urls, previous=pages, html_store=html_store, static_first=STATIC_FETCH, min_text_chars=STATIC_MIN_TEXT_CHARS,
+        browsers=SCRAPE_BROWSERS, concurrency=SCRAPE_CONCURRENCY, timeout_ms=SCRAPE_TIMEOUT_MS,
+    )
+    save_web_fetch_stats(url_stats)
 
-    with open(WEB_CACHE, 'wb') as f:
-        pickle.dump(web_docs, f)
+    # URLs dropped from urls.txt disappear here, and so from the index on the next sync
+    pages = {url: entry for url, entry in entries.items() if entry is not None}
+    html_store.retain(pages)
+    html_store.prune()
+    html_store.save()
+    # Pages that were not re-fetched (304 / failed) may still carry text from an older extractor
+    reextract_web_pages(pages, html_store, urls=list(pages) if reextract else None)
+    save_web_pages(pages)
 
+    web_docs = web_pages_to_documents(pages, boilerplate_path, refit=reextract)
     print(f"Processed {len(web_docs)} web documents in {time.time() - start_time:.2f} seconds")
     return web_docs
 
-# Global variables for the RAG system
+def open_vectorstore(persist_dir: str):
+    """Open a persisted vectorstore for the configured backend."""
+    if VECTOR_BACKEND == "chroma":
+        from langchain_community.vectorstores import Chroma
+        return Chroma(persist_directory=persist_dir, embedding_function=embedding_model)
+    return NumpyVectorStore(embedding_model, persist_directory=persist_dir, quantize=VECTOR_BACKEND == "numpy_int8")
+
+def get_indexed_documents(store) -> list:
+    """Return every chunk held by a vectorstore as Documents."""
+    if hasattr(store, "get_documents"):
+        return store.get_documents()
+    data = store.get(include=["documents", "metadatas"])
+    return [Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(data["documents"], data["metadatas"])]
+
+def create_build_encoder():
+    """Multi-process document encoder for index builds, or None to embed through the store."""
+    if BUILD_EMBED_WORKERS < 2 or EMBEDDING_BACKEND != "torch":
+        return None
+    from parallel_embeddings import MultiProcessEmbeddings
+    return MultiProcessEmbeddings(EMBEDDING_OPTIONS[SELECTED_MODEL], workers=BUILD_EMBED_WORKERS,
+                                  batch_size=BUILD_EMBED_BATCH_SIZE, torch_threads=BUILD_TORCH_THREADS)
+
+def open_chunk_embedding_cache(embeddings):
+    """Wrap a document encoder in the persistent chunk embedding cache, or None when disabled."""
+    if not CHUNK_EMBEDDING_CACHE:
+        return None
+    # ONNX int8 vectors differ from torch ones, so the backend is part of the key
+    return ChunkEmbeddingCache(embeddings, CHUNK_EMBEDDING_CACHE,
+                               model=f"{EMBEDDING_OPTIONS[SELECTED_MODEL]}@{EMBEDDING_BACKEND}")
+
+def add_chunks(store, chunks: list, ids: list, encoder=None):
+    """Embed and upsert chunks, with a separate build encoder when one is given."""
+    if encoder is None:
+        store.add_documents(chunks, ids=ids)
+        return
+    texts = [chunk.page_content for chunk in chunks]
+    metadatas = [chunk.metadata for chunk in chunks]
+    vectors = encoder.embed_documents(texts)
+    if hasattr(store, "add_embeddings"):
+        store.add_embeddings(texts, vectors, metadatas, ids)
+    else:
+        store._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+
+def persist_vectorstore(store):
+    if hasattr(store, "persist"):
+        store.persist()
+
+def iter_source_groups(documents):
+    """Yield (source, documents) from a document stream whose sources are contiguous."""
+    seen = set()
+    for source, docs in itertools.groupby(documents, key=lambda doc: doc.metadata.get("source", "")):
+        if source in seen:
+            raise ValueError(f"Documents of {source} are not contiguous in the ingest stream")
+        seen.add(source)
+        yield source, list(docs)
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process so far (0 where the resource module is unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def source_content_hash(documents: list) -> str:
+    """Hash the parsed content and metadata of one source (file or URL), and how it is chunked."""
+    digest = hashlib.sha256(f"chunker {CHUNKER_VERSION}\n".encode('utf-8'))
+    for doc in documents:
+        digest.update(doc.page_content.encode('utf-8'))
+        digest.update(json.dumps(doc.metadata, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+def chunk_ids_for(source: str, chunks: list) -> list:
+    """Deterministic chunk IDs derived from the source and chunk text."""
+    occurrences = Counter()
+    ids = []
+    for chunk in chunks:
+        occurrences[chunk.page_content] += 1
+        key = f"{source}\x00{occurrences[chunk.page_content]}\x00{chunk.page_content}"
+        ids.append(hashlib.sha1(key.encode('utf-8')).hexdigest())
+    return ids
+
+def load_manifest(path: str) -> dict:
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_manifest(manifest: dict, path: str):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+def sync_vectorstore(store, documents, manifest: dict, manifest_path: str,
+                     batch_size: int = INGEST_BATCH_SIZE, encoder=None) -> dict:
+    """Bring a persisted vectorstore in line with the current documents.
+
+    ``documents`` is consumed as a stream, one source at a time. Sources whose
+    content hash is unchanged are skipped. For changed sources only chunks with new
+    IDs are embedded, and chunks that disappeared are deleted. Work is flushed in
+    batches of ``batch_size`` chunks and the manifest is saved whenever the store is
+    persisted, so it always describes what the store holds on disk and an interrupted
+    build can resume. A NumpyVectorStore is persisted every NUMPY_PERSIST_EVERY flushes
+    and after the last one; other stores after every flush.
+    An empty manifest builds the store from scratch. ``encoder`` replaces the
+    store's own embedding function for document embedding (see create_build_encoder).
+    """
+    start_time = time.time()
+    checkpoint = dict(manifest)  # old entries stay until their source's new chunks are flushed
+    seen = set()
+    pending = {"chunks": [], "ids": [], "delete": [], "sources": {}}
+    stats = Counter(changed_sources=0, removed_sources=0, added_chunks=0, deleted_chunks=0, batches=0)
+    embed_seconds = 0.0
+    persist_every = NUMPY_PERSIST_EVERY if isinstance(store, NumpyVectorStore) else 1
+    flushes = 0
+
+    def flush(final: bool = False):
+        nonlocal embed_seconds, flushes
+        if pending["delete"]:
+            store.delete(ids=pending["delete"])
+        for offset in range(0, len(pending["chunks"]), batch_size):
+            batch_start = time.perf_counter()
+            add_chunks(store, pending["chunks"][offset:offset + batch_size],
+                       pending["ids"][offset:offset + batch_size], encoder)
+            embed_seconds += time.perf_counter() - batch_start
+            stats["batches"] += 1
+        checkpoint.update(pending["sources"])
+        flushes += 1
+        if final or flushes % persist_every == 0:
+            persist_vectorstore(store)
+            save_manifest(checkpoint, manifest_path)
+
+        stats["added_chunks"] += len(pending["chunks"])
+        stats["deleted_chunks"] += len(pending["delete"])
+        index_build_status["phase"] = f"embedding: {stats['added_chunks']} chunks upserted"
+        rate = stats["added_chunks"] / embed_seconds if embed_seconds else 0.0
+        print(f"  upserted {stats['added_chunks']} chunks, deleted {stats['deleted_chunks']} "
+              f"({time.time() - start_time:.1f}s, {rate:.1f} chunks/s, peak RSS {peak_rss_mb():.0f} MB)")
+        pending.update(chunks=[], ids=[], delete=[], sources={})
+
+    for source, docs in iter_source_groups(documents):
+        seen.add(source)
+        digest = source_content_hash(docs)
+        previous = manifest.get(source)
+        if previous and previous["hash"] == digest:
+            continue
+
+        stats["changed_sources"] += 1
+        source_chunks = split_documents(docs)
+        source_ids = chunk_ids_for(source, source_chunks)
+        previous_ids = set(previous["chunk_ids"]) if previous else set()
+        current_ids = set(source_ids)
+        pending["delete"].extend(chunk_id for chunk_id in previous_ids if chunk_id not in current_ids)
+        for chunk, chunk_id in zip(source_chunks, source_ids):
+            if chunk_id not in previous_ids:
+                pending["chunks"].append(chunk)
+                pending["ids"].append(chunk_id)
+        pending["sources"][source] = {"hash": digest, "chunk_ids": source_ids}
+        if len(pending["chunks"]) >= batch_size:
+            flush()
+
+    removed_sources = [source for source in manifest if source not in seen]
+    for source in removed_sources:
+        pending["delete"].extend(manifest[source]["chunk_ids"])
+        checkpoint.pop(source)
+    stats["removed_sources"] = len(removed_sources)
+
+    if pending["chunks"] or pending["delete"] or pending["sources"] or removed_sources or flushes % persist_every:
+        flush(final=True)
+    elif checkpoint != manifest or not os.path.exists(manifest_path):
+        save_manifest(checkpoint, manifest_path)
+
+    stats = dict(stats, seconds=round(time.time() - start_time, 2), embed_seconds=round(embed_seconds, 2),
+                 chunks_per_second=round(stats["added_chunks"] / embed_seconds, 1) if embed_seconds else None,
+                 peak_rss_mb=round(peak_rss_mb()))
+    print(f"Index sync: {stats}")
+    return stats
+
+# Global variables for the RAG system (always the active index version)
 vectorstore = None
 retriever = None
+abbreviation_index = {}
+entity_table = {}
+lexical_index = None
+
+# Blue/green index state: requests read one immutable snapshot, rebuilds swap in a new one
+active_index = None
+index_swap_lock = threading.Lock()
+rebuild_lock = threading.Lock()
+index_build_status = {
+    "state": "idle",
+    "target_version": None,
+    "phase": None,
+    "started_at": None,
+    "finished_at": None,
+    "error": None,
+    "stats": None,
+}
+
+def iter_all_documents(refresh_web: bool = False, reextract_web: bool = False, boilerplate_path: str = None):
+    """Stream local and web documents, each source's documents together."""
+    count = 0
+    web_documents = load_web_documents(refresh=refresh_web, reextract=reextract_web, boilerplate_path=boilerplate_path)
+    for page in itertools.chain(load_local_files(), web_documents):
+        for doc in (page if isinstance(page, list) else [page]):
+            count += 1
+            yield doc
+    print(f"Total documents processed: {count}")
+
+def read_current_version() -> int:
+    if not os.path.exists(CURRENT_INDEX_FILE):
+        return None
+    with open(CURRENT_INDEX_FILE, 'r') as f:
+        return json.load(f)["version"]
+
+def build_index_version(version: int, source_version: int = None, refresh_web: bool = False,
+                        reextract_web: bool = False) -> dict:
+    """Build index ``version`` and return its snapshot, leaving the active version untouched.
+
+    With ``source_version`` the new version starts as a copy of that version and is
+    synced incrementally (in place when both are the same); otherwise every chunk
+    is embedded from scratch.
+    """
+    persist_dir = index_dir(version)
+    manifest_path = persist_dir + '_manifest.json'
+    # Boilerplate lines stripped from web pages, kept with the version (see web_pages_to_documents)
+    boilerplate_path = persist_dir + '_boilerplate.json'
+    # Present while a new version is being built; lets a crashed build of the same kind resume
+    building_path = persist_dir + '_building.json'
+
+    resumable = False
+    if source_version != version and os.path.exists(building_path):
+        with open(building_path, 'r') as f:
+            resumable = json.load(f).get("source_version") == source_version and os.path.exists(manifest_path)
+    if source_version != version and not resumable:
+        # Never reuse leftovers of a different earlier build that failed before activation
+        shutil.rmtree(persist_dir, ignore_errors=True)
+        for path in (manifest_path, boilerplate_path):
+            if os.path.exists(path):
+                os.remove(path)
+        if source_version is not None and os.path.exists(index_dir(source_version)):
+            index_build_status["phase"] = f"copying index v{source_version}"
+            shutil.copytree(index_dir(source_version), persist_dir)
+            for suffix in ('_manifest.json', '_boilerplate.json'):
+                if os.path.exists(index_dir(source_version) + suffix):
+                    shutil.copyfile(index_dir(source_version) + suffix, persist_dir + suffix)
+    if source_version != version:
+        with open(building_path, 'w') as f:
+            json.dump({"source_version": source_version}, f)
+
+    manifest = load_manifest(manifest_path)
+    if manifest is not None and os.path.exists(persist_dir) and os.listdir(persist_dir):
+        print(f"{'Resuming' if resumable else 'Loading'} {VECTOR_BACKEND} vectorstore v{version} "
+              f"from disk ({SELECTED_MODEL})...")
+    else:
+        # A store without a manifest cannot be updated incrementally
+        shutil.rmtree(persist_dir, ignore_errors=True)
+        manifest = {}
+        print(f"Creating new {VECTOR_BACKEND} vectorstore v{version} with {SELECTED_MODEL} ({EMBEDDING_BACKEND})...")
+    store = open_vectorstore(persist_dir)
+
+    # Documents stream through split -> batched embed -> batched upsert; only the
+    # abbreviation list sections are kept aside for the abbreviation index
+    abbreviation_docs = []
+
+    def tap_abbreviation_lists(documents):
+        for doc in documents:
+            if ABBREVIATION_LIST_HEADER in doc.page_content.lower():
+                abbreviation_docs.append(doc)
+            yield doc
+
+    index_build_status["phase"] = "loading documents"
+    documents = tap_abbreviation_lists(iter_all_documents(refresh_web=refresh_web, reextract_web=reextract_web,
+                                                          boilerplate_path=boilerplate_path))
+    encoder = create_build_encoder()
+    chunk_cache = open_chunk_embedding_cache(encoder or embedding_model.embeddings)
+    try:
+        stats = sync_vectorstore(store, documents, manifest, manifest_path, encoder=chunk_cache or encoder)
+        if chunk_cache is not None:
+            stats["embedding_cache"] = chunk_cache.stats()
+            print(f"Chunk embedding cache: {stats['embedding_cache']}")
+    finally:
+        if chunk_cache is not None:
+            chunk_cache.close()
+        if encoder is not None:
+            encoder.close()
+    if encoder is not None:
+        stats["encoder"] = encoder.stats()
+        print(f"Build encoder: {stats['encoder']}")
+    changed = bool(stats["changed_sources"] or stats["removed_sources"])
+    stats["resumed"] = resumable
+
+    index_build_status["phase"] = "building abbreviation and BM25 indexes"
+    # Abbreviations are resolved once here instead of by retrieval on every query
+    abbreviations = load_abbreviation_index(abbreviation_docs, persist_dir + '_abbreviations.json', rebuild=changed)
+
+    # In-memory inverted index over the same chunks for hybrid BM25 + vector ranking
+    lexical = BM25Index(get_indexed_documents(store))
+    print(f"Built BM25 index over {len(lexical)} chunks")
+    entities = build_entity_table(lexical.documents, abbreviations)
+
+    if os.path.exists(building_path):
+        os.remove(building_path)
+    return {
+        "version": version,
+        "vectorstore": store,
+        "retriever": store.as_retriever(search_kwargs={"k": 8}),  # Increased k for better coverage
+        "abbreviations": abbreviations,
+        "entities": entities,
+        "lexical": lexical,
+        "chunks": len(lexical),
+        "stats": stats,
+    }
+
+def activate_index(snapshot: dict, publish: bool = True):
+    """Atomically make ``snapshot`` the served index and drop versions older than the previous one.
+
+    ``publish=False`` only swaps this process over (pre-fork workers following a
+    version another worker built) and leaves the current pointer and old versions alone.
+    """
+    global active_index, vectorstore, retriever, abbreviation_index, entity_table, lexical_index
+    published = read_current_version() if publish else None
+    with index_swap_lock:
+        previous = active_index
+        active_index = snapshot
+        vectorstore = snapshot["vectorstore"]
+        retriever = snapshot["retriever"]
+        abbreviation_index = snapshot["abbreviations"]
+        entity_table = snapshot["entities"]
+        lexical_index = snapshot["lexical"]
+    if not publish:
+        print(f"✅ Serving index v{snapshot['version']}")
+        return
+
+    with open(CURRENT_INDEX_FILE + '.tmp', 'w') as f:
+        json.dump({"version": snapshot["version"]}, f)
+    os.replace(CURRENT_INDEX_FILE + '.tmp', CURRENT_INDEX_FILE)
+    print(f"✅ Serving index v{snapshot['version']}")
+
+    # The previous version is kept so requests (and other workers) still holding it can finish
+    keep = {snapshot["version"], previous["version"] if previous else None, published}
+    for name in os.listdir(CACHE_DIR):
+        match = re.fullmatch(re.escape(os.path.basename(INDEX_BASE)) + r'_v(\d+)', name)
+        if match and int(match.group(1)) not in keep:
+            stale = os.path.join(CACHE_DIR, name)
+            shutil.rmtree(stale, ignore_errors=True)
+            for suffix in ('_manifest.json', '_abbreviations.json', '_boilerplate.json', '_building.json'):
+                if os.path.exists(stale + suffix):
+                    os.remove(stale + suffix)
+
+def get_active_index() -> dict:
+    """Return the snapshot of the index version currently being served."""
+    return active_index
+
+def open_index_version(version: int) -> dict:
+    """Open an already built index version for serving, without loading or syncing documents."""
+    persist_dir = index_dir(version)
+    store = open_vectorstore(persist_dir)
+    abbreviations = load_abbreviation_index([], persist_dir + '_abbreviations.json')
+    lexical = BM25Index(get_indexed_documents(store))
+    entities = build_entity_table(lexical.documents, abbreviations)
+    return {
+        "version": version,
+        "vectorstore": store,
+        "retriever": store.as_retriever(search_kwargs={"k": 8}),
+        "abbreviations": abbreviations,
+        "entities": entities,
+        "lexical": lexical,
+        "chunks": len(lexical),
+        "stats": {},
+    }
+
+def follow_current_version() -> bool:
+    """Switch to the version published in CURRENT_INDEX_FILE if another process built a newer one."""
+    version = read_current_version()
+    if active_index is None or version is None or version == active_index["version"]:
+        return False
+    activate_index(open_index_version(version), publish=False)
+    return True
+
+def prepare_prefork_parent():
+    """Run in the pre-fork master once everything is loaded, just before workers are forked.
+
+    Moving the loaded objects to the permanent GC generation keeps collections in the
+    workers from writing to (and so copying) the pages they share with the master.
+    """
+    gc.collect()
+    gc.freeze()
+
+def prepare_prefork_worker():
+    """Run in each pre-fork worker right after the fork.
+
+    The model weights, BM25 index and (for the NumPy backends) the memory-mapped vectors
+    stay shared with the master. Chroma's SQLite client must not cross a fork, so each
+    worker opens its own handle on the same persisted version.
+    """
+    global gemini_model
+    # gRPC channels do not survive a fork either; each worker configures its own client
+    gemini_model = None
+    if VECTOR_BACKEND == "chroma" and active_index is not None:
+        from chromadb.api.client import SharedSystemClient
+        SharedSystemClient.clear_system_cache()
+        store = open_vectorstore(index_dir(active_index["version"]))
+        activate_index(dict(active_index, vectorstore=store, retriever=store.as_retriever(search_kwargs={"k": 8})),
+                       publish=False)
+
+def rebuild_lock_held_elsewhere() -> bool:
+    """True while another process holds the rebuild file lock."""
+    with open(REBUILD_LOCK_FILE, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return False
+
+def is_rebuild_in_progress() -> bool:
+    return rebuild_lock.locked() or rebuild_lock_held_elsewhere()
+
+def get_index_status() -> dict:
+    snapshot = active_index
+    return {
+        "active_version": snapshot["version"] if snapshot else None,
+        "active_chunks": snapshot["chunks"] if snapshot else None,
+        "build": dict(index_build_status),
+    }
 
 def initialize_rag_system():
     """Initialize the RAG system once and keep it in memory."""
-    global vectorstore, retriever
-    
-    if vectorstore is not None and retriever is not None:
+    if active_index is not None:
         print("RAG system already initialized.")
         return
     
     print("Initializing RAG system...")
     start_time = time.time()
+
+    # Reopen (and sync in place) the version that was being served before the restart
+    version = read_current_version() or 1
+    activate_index(build_index_version(version, source_version=version))
+    index_build_status["phase"] = None
+    startup_timings["index_load"] = round(time.time() - start_time, 3)
     
-    local_docs = load_local_files()
-    web_docs = load_web_documents()
-    pages = local_docs + web_docs
-
-    flat_pages = []
-    for page in tqdm(pages, desc="Flattening documents"):
-        if isinstance(page, list):
-            flat_pages.extend(page)
-        else:
-            flat_pages.append(page)
+    print(f"RAG system initialized in {time.time() - start_time:.2f} seconds")
+
+def warm_up_rag_system(queries: list = None):
+    """Load the embedding model and run representative retrievals so the first real query is served warm."""
+    queries = WARMUP_QUERIES if queries is None else queries
+    print("Loading embedding model...")
+    start_time = time.time()
+    embedding_model.embeddings.load()
+    startup_timings["embedding_model"] = round(time.time() - start_time, 3)
+    print(f"Model loaded in {time.time() - start_time:.2f} seconds")
 
-    print(f"Total documents to process: {len(flat_pages)}")
+    start_time = time.time()
+    get_gemini_model()
+    startup_timings["llm_client"] = round(time.time() - start_time, 3)
 
-    # Use model-specific persist directory to avoid conflicts
-    PERSIST_DIR = os.path.join(CACHE_DIR, f'chroma_{SELECTED_MODEL}')
+    start_time = time.time()
+    index = get_active_index()
+    for query in queries:
+        multi_step_retrieve(index["retriever"], query, index=index)
+    startup_timings["warm_up_queries"] = round(time.time() - start_time, 3)
+    print(f"Warmed up with {len(queries)} queries in {time.time() - start_time:.2f} seconds")
 
-    if os.path.exists(PERSIST_DIR) and os.listdir(PERSIST_DIR):
-        print(f"Loading Chroma vectorstore from disk ({SELECTED_MODEL})...")
-        vectorstore = Chroma(persist_directory=PERSIST_DIR, embedding_function=embedding_model)
-    else:
-        print("Creating text chunks...")
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=200)
-        split_docs = text_splitter.split_documents(flat_pages)
-        print(f"Created {len(split_docs)} chunks")
+def rebuild_rag_system(full: bool = False, refresh_web: bool = False, reextract_web: bool = False) -> dict:
+    """Build the next index version while the current one keeps serving, then swap it in.
 
-        print(f"Creating new Chroma vectorstore with {SELECTED_MODEL}...")
-        vectorstore = Chroma.from_documents(split_docs, embedding=embedding_model, persist_directory=PERSIST_DIR)
-        vectorstore.persist()
+    By default the new version starts from a copy of the active one, so only changed
+    files are parsed and only new chunks are embedded. With ``full=True`` the document
+    caches are discarded and every chunk is embedded from scratch. ``refresh_web``
+    re-checks every URL with conditional requests so changed pages are picked up, and
+    ``reextract_web`` re-derives all web page text from the stored raw HTML.
+    """
+    if not rebuild_lock.acquire(blocking=False):
+        raise RuntimeError("An index rebuild is already in progress")
+    lock_file = open(REBUILD_LOCK_FILE, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        rebuild_lock.release()
+        raise RuntimeError("An index rebuild is already in progress in another worker")
 
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 8})  # Increased k for better coverage
-    
-    print(f"RAG system initialized in {time.time() - start_time:.2f} seconds")
+    start_time = time.time()
+    try:
+        # The published version, not this process's: another worker may have rebuilt since
+        current = read_current_version() or (active_index["version"] if active_index else None)
+        target = (current or 0) + 1
+        index_build_status.update(state="building", target_version=target, phase="starting",
+                                  started_at=start_time, finished_at=None, error=None, stats=None)
+
+        if full:
+            shutil.rmtree(DOCS_CACHE, ignore_errors=True)
+            if os.path.exists(WEB_CACHE):
+                os.remove(WEB_CACHE)
+
+        snapshot = build_index_version(target, source_version=None if full else current,
+                                       refresh_web=refresh_web, reextract_web=reextract_web)
+        activate_index(snapshot)
+
+        stats = dict(snapshot["stats"], mode="full" if full else "incremental", refresh_web=refresh_web,
+                     reextract_web=reextract_web, version=target,
+                     seconds=round(time.time() - start_time, 2))
+        index_build_status.update(state="idle", phase=None, finished_at=time.time(), stats=stats)
+        return stats
+    except Exception as e:
+        index_build_status.update(state="failed", finished_at=time.time(), error=str(e))
+        raise
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+        rebuild_lock.release()
 
 def query_rag_system(question: str) -> str:
     """Query the RAG system with a question."""
-    global retriever
-    
-    if retriever is None:
+    if active_index is None:
         initialize_rag_system()
     
     try:
-        chunks = multi_step_retrieve(retriever, question)
+        index = get_active_index()
+        chunks = multi_step_retrieve(index["retriever"], question, index=index)
         answer = generate_answer_with_gemini(question, chunks)
         return answer
     except Exception as e:
@@ -452,6 +1475,7 @@ def query_rag_system(question: str) -> str:
 def main():
     """Main function for testing the RAG system."""
     initialize_rag_system()
+    warm_up_rag_system()
     
     questions = [
         "what is po",
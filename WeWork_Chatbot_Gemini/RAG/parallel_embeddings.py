@@ -0,0 +1,111 @@
+"""
+Parallel Embeddings
+Shards document embedding across a pool of sentence-transformers worker processes
+for index builds, so a cold build uses every core instead of one.
+
+Each worker runs torch with a fixed thread count (cores / workers by default) so
+the pool does not oversubscribe the machine. Workers are spawned and load their own
+model; the process that owns the pool loads none and keeps its thread settings.
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# The model loaded by _init_worker in each pool process
+_worker_model = None
+
+
+def _init_worker(model_name: str, torch_threads: int):
+    """Pool initializer. Thread settings are made here, so the serving process keeps its own."""
+    global _worker_model
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(torch_threads)
+    _worker_model = SentenceTransformer(model_name, device='cpu')
+
+
+def _encode_chunk(args) -> np.ndarray:
+    texts, batch_size = args
+    return _worker_model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+
+class MultiProcessEmbeddings(Embeddings):
+    """Document embeddings from a pool of sentence-transformers worker processes.
+
+    The pool is started on the first embed_documents call and must be released with
+    close() (or by using the object as a context manager). Vectors are L2-normalised
+    to match the HuggingFaceEmbeddings used at query time.
+    """
+
+    def __init__(self, model_name: str, workers: int, batch_size: int = 64, torch_threads: int = None):
+        self.model_name = model_name
+        self.workers = workers
+        self.batch_size = batch_size
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+
+        self._pool = None
+        self.chunks = 0
+        self.encode_seconds = 0.0
+        self.startup_seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _start(self):
+        start = time.perf_counter()
+        # Spawned, not forked: the parent may already run torch and tokenizer threads
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_init_worker, initargs=(self.model_name, self.torch_threads))
+        # One tiny batch per worker, so model loading counts as startup rather than encode time
+        list(self._pool.map(_encode_chunk, [([""], 1)] * self.workers))
+        self.startup_seconds = time.perf_counter() - start
+        print(f"Started {self.workers} embedding workers x {self.torch_threads} torch threads "
+              f"in {self.startup_seconds:.1f}s")
+
+    def embed_documents(self, texts: list) -> list:
+        texts = list(texts)
+        if not texts:
+            return []
+        if self._pool is None:
+            self._start()
+
+        start = time.perf_counter()
+        # Hand each worker several batches per round trip to keep the pool busy
+        chunk_size = max(self.batch_size, -(-len(texts) // (self.workers * 2)))
+        chunks = [(texts[i:i + chunk_size], self.batch_size) for i in range(0, len(texts), chunk_size)]
+        vectors = np.vstack(list(self._pool.map(_encode_chunk, chunks)))
+        vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        self.encode_seconds += time.perf_counter() - start
+        self.chunks += len(texts)
+        return vectors.astype(np.float32).tolist()
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "torch_threads": self.torch_threads,
+            "batch_size": self.batch_size,
+            "chunks": self.chunks,
+            "startup_seconds": round(self.startup_seconds, 2),
+            "encode_seconds": round(self.encode_seconds, 2),
+            "chunks_per_second": round(self.chunks / self.encode_seconds, 1) if self.encode_seconds else None,
+        }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
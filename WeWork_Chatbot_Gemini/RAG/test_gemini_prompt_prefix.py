@@ -0,0 +1,56 @@
+"""
+Prompt Prefix Test
+Two unrelated /chat requests, built the way the API builds them (the model from
+get_gemini_model() and the prompt from build_gemini_prompt()), must serialise to the
+same bytes up to the end of the system instruction, with nothing from the request
+before that point; otherwise Gemini's implicit cache never hits.
+
+Run from the RAG folder: python -m pytest test_gemini_prompt_prefix.py
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("google.generativeai", reason="needs the packages in requirements.txt")
+# optimized_rag refuses to import without a key; the test only builds requests and sends none
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+optimized_rag = pytest.importorskip("optimized_rag", reason="needs the packages in requirements.txt")
+from langchain_core.documents import Document
+
+REQUESTS = [
+    ("What is a private office?",
+     [Document(page_content="A private office is a lockable room for teams of 1 to 100 people.")]),
+    ("Can I cancel a conference room booking in Pune?",
+     [Document(page_content="PO members can cancel bookings up to 24 hours ahead."),
+      Document(page_content="Pune: Embassy Tech Zone, Hinjewadi.")]),
+]
+
+
+def serialise(question: str, chunks: list) -> tuple:
+    """(request bytes, length of the system instruction part) for one /chat request.
+
+    The generateContent request is serialised in the order the model reads it: the
+    system instruction, then the contents (on the wire protobuf orders fields by number).
+    """
+    model = optimized_rag.get_gemini_model()
+    request = model._prepare_request(contents=optimized_rag.build_gemini_prompt(question, chunks))
+    system = type(request.system_instruction).serialize(request.system_instruction)
+    contents = b"".join(type(content).serialize(content) for content in request.contents)
+    return system + contents, len(system)
+
+
+def test_system_instruction_is_byte_identical_across_requests():
+    (first, first_end), (second, second_end) = (serialise(question, chunks) for question, chunks in REQUESTS)
+    assert first_end > 0 and first_end == second_end
+    assert first[:first_end] == second[:second_end]
+    assert first != second
+
+
+@pytest.mark.parametrize("question, chunks", REQUESTS)
+def test_no_request_text_before_end_of_system_instruction(question, chunks):
+    body, end = serialise(question, chunks)
+    for text in [question] + [chunk.page_content for chunk in chunks]:
+        encoded = text.encode('utf-8')
+        assert encoded not in body[:end]
+        assert body.index(encoded) >= end
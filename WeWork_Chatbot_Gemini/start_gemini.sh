@@ -40,7 +40,15 @@ echo "🔥 Starting Gemini backend..."
 # Use shared data folder if present
 export WEWORK_DATA_DIR=${WEWORK_DATA_DIR:-"$(cd ../.. && pwd)/data/files"}
 export WEWORK_URLS_FILE=${WEWORK_URLS_FILE:-"$(cd ../.. && pwd)/data/url_files/urls.txt"}
-python flask_api.py &
+# WEWORK_SERVER=gunicorn serves with pre-forked workers sharing one loaded index (see gunicorn.conf.py);
+# WEWORK_SERVER=asgi serves the async API, which keeps many slow LLM calls in flight per process
+if [ "$WEWORK_SERVER" = "gunicorn" ]; then
+    gunicorn -c gunicorn.conf.py &
+elif [ "$WEWORK_SERVER" = "asgi" ]; then
+    uvicorn asgi_api:app --host 0.0.0.0 --port 5000 &
+else
+    python flask_api.py &
+fi
 BACKEND_PID=$!
 
 # Wait a moment for backend to start